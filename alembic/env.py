@@ -7,6 +7,7 @@ from alembic import context
 from flask import current_app
 from sqlalchemy import engine_from_config, MetaData
 from sqlalchemy import pool
+from sqlalchemy.engine.url import make_url
 
 from slobsterble.app import db
 
@@ -28,6 +29,13 @@ config.set_main_option('sqlalchemy.url', current_app.config['SQLALCHEMY_DATABASE
 
 target_metadata = db.metadata
 
+# Batch executemany() calls into multi-row statements on psycopg2 so that
+# data migrations inserting many rows do not run one statement per row.
+POSTGRESQL_ENGINE_OPTIONS = {
+    'executemany_mode': 'values_plus_batch',
+    'executemany_values_page_size': 10000,
+}
+
 
 def combine_metadata():
     m = MetaData()
@@ -70,9 +78,14 @@ def run_migrations_online():
     In this scenario we need to create an Engine
     and associate a connection with the context.
     """
+    engine_options = {}
+    url = make_url(config.get_main_option('sqlalchemy.url'))
+    if url.get_backend_name() == 'postgresql':
+        engine_options = POSTGRESQL_ENGINE_OPTIONS
     engine = engine_from_config(config.get_section(config.config_ini_section),
                                 prefix='sqlalchemy.',
-                                poolclass=pool.NullPool)
+                                poolclass=pool.NullPool,
+                                **engine_options)
     connection = engine.connect()
     context.configure(connection=connection,
                       target_metadata=target_metadata,
@@ -6,16 +6,13 @@ Revises: 6296db12b063
 Create Date: 2020-06-11 21:16:27.361069
 
 """
+import csv
+import io
 import os
-import sys
-from collections import defaultdict
 
+import sqlalchemy as sa
 from alembic import op
 from flask import current_app
-from sqlalchemy import orm
-
-sys.path.append(os.getcwd())
-from slobsterble.models import Dictionary, Entry
 
 
 # revision identifiers, used by Alembic.
@@ -24,32 +21,119 @@ down_revision = '6296db12b063'
 branch_labels = None
 depends_on = None
 
+# Number of rows inserted together outside of PostgreSQL.
+PAGE_SIZE = 2000
+# Read the dictionary files in 1 MiB chunks.
+READ_BUFFER_SIZE = 1 << 20
+
+dictionary_table = sa.table(
+    'dictionary',
+    sa.column('id', sa.Integer),
+    sa.column('name', sa.String))
+entry_table = sa.table(
+    'entry',
+    sa.column('id', sa.Integer),
+    sa.column('word', sa.String))
+entries_table = sa.table(
+    'entries',
+    sa.column('entry_id', sa.Integer),
+    sa.column('dictionary_id', sa.Integer))
+
+
+def _truncate_empty_tables(bind, tables):
+    """
+    Truncate the tables if they are all empty.
+
+    COPY FREEZE only accepts a table that was created or truncated in the
+    current transaction. The tables are truncated in one statement without
+    CASCADE, so no other table is touched, and a table that another table
+    still references makes the truncate fail rather than empty both.
+    Return True iff the tables were truncated.
+    """
+    for table in tables:
+        if bind.execute(sa.select(sa.literal(1)).select_from(
+                table).limit(1)).first() is not None:
+            return False
+    op.execute('TRUNCATE %s' % ', '.join(table.name for table in tables))
+    return True
+
+
+def _copy_rows(bind, table, columns, rows, freeze):
+    """
+    Stream the rows into the table with a PostgreSQL COPY.
+
+    The rows are written as CSV so that values containing tabs, newlines
+    or backslashes are quoted rather than breaking the stream. With freeze,
+    the rows are written already frozen, which spares a later vacuum from
+    rewriting every page.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        [row[column] for column in columns] for row in rows)
+    buffer.seek(0)
+    options = 'FORMAT csv, FREEZE' if freeze else 'FORMAT csv'
+    cursor = bind.connection.cursor()
+    try:
+        cursor.copy_expert('COPY %s (%s) FROM STDIN WITH (%s)' % (
+            table.name, ', '.join(columns), options), buffer)
+    finally:
+        cursor.close()
+
+
+def _insert_rows(bind, table, columns, rows, freeze=False):
+    """
+    Insert the rows into the table.
+
+    PostgreSQL loads the whole table with a single COPY in the migration
+    transaction. Other databases insert the rows in pages of PAGE_SIZE.
+    SQLite does not use transactional DDL, so each page is committed as
+    soon as it is written.
+    """
+    if bind.dialect.name == 'postgresql':
+        _copy_rows(bind, table, columns, rows, freeze)
+        return
+    for start in range(0, len(rows), PAGE_SIZE):
+        op.bulk_insert(table, rows[start:start + PAGE_SIZE])
+
 
 def upgrade():
     bind = op.get_bind()
-    session = orm.Session(bind=bind)
     dictionary_names = {'ENABLE (North American)': 'enable.txt',
                         'YAWL (Extended)': 'yawl.txt'}
     if current_app.config['TESTING']:
         dictionary_names = {'TEST_1': 'test_1.txt'}
-    dict_words = defaultdict(list)
-    entries = {}
+    all_words = set()
+    word_dictionaries = []
     for dictionary_name, path in dictionary_names.items():
-        dictionary = Dictionary(name=dictionary_name)
-        with open(os.path.abspath('dictionaries/%s' % path)) as dictionary_file:
-            file_words = dictionary_file.readlines()
-            file_words = [word.rstrip().lower() for word in file_words]
-            for word in file_words:
-                if word not in entries:
-                    entry = Entry(word=word)
-                    entries[word] = entry
-                    session.add(entry)
-                dict_words[dictionary].append(word)
-    for dictionary, words in dict_words.items():
-        for word in words:
-            dictionary.entries.append(entries[word])
-        session.add(dictionary)
-    session.commit()
+        with open(os.path.abspath('dictionaries/%s' % path),
+                  buffering=READ_BUFFER_SIZE,
+                  encoding='utf-8') as dictionary_file:
+            file_words = {line.rstrip().lower() for line in dictionary_file}
+            all_words.update(file_words)
+            word_dictionaries.extend(
+                (word, dictionary_name) for word in file_words)
+    # Order the association rows by word, and so by entry id.
+    word_dictionaries.sort()
+
+    op.bulk_insert(dictionary_table, [
+        {'name': dictionary_name} for dictionary_name in dictionary_names])
+    dictionary_ids = dict(
+        (name, dictionary_id) for dictionary_id, name in bind.execute(
+            sa.select(dictionary_table.c.id, dictionary_table.c.name)))
+
+    # COPY FREEZE needs the tables truncated in this transaction, which is
+    # only done when they hold no rows that the truncate could lose.
+    freeze = bind.dialect.name == 'postgresql' and _truncate_empty_tables(
+        bind, (entry_table, entries_table))
+    _insert_rows(bind, entry_table, ['word'],
+                 [{'word': word} for word in sorted(all_words)], freeze)
+    word_to_id = dict(
+        (word, entry_id) for entry_id, word in bind.execute(
+            sa.select(entry_table.c.id, entry_table.c.word)))
+    _insert_rows(bind, entries_table, ['dictionary_id', 'entry_id'], [
+        {'dictionary_id': dictionary_ids[dictionary_name],
+         'entry_id': word_to_id[word]}
+        for word, dictionary_name in word_dictionaries], freeze)
     # ### end Alembic commands ###
 
 
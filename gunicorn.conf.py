@@ -1,6 +1,37 @@
 import multiprocessing
 
 bind = '192.168.0.17:8000'
-workers = multiprocessing.cpu_count() * 2 + 1
+# The views spend most of their time waiting on the database, so serve
+# requests from threads that share one process heap rather than from
+# many single-threaded processes.
+worker_class = 'gthread'
+threads = 8
+workers = multiprocessing.cpu_count()
+preload_app = True
+max_requests = 1000
+max_requests_jitter = 100
 
 wsgi_app = 'slobsterble.wsgi:app'
+
+
+def on_starting(server):
+    """Create the admin user once, before the workers are forked."""
+    from slobsterble.app import ensure_admin
+    from slobsterble.wsgi import app
+    with app.app_context():
+        created = ensure_admin()
+    if created is None:
+        server.log.warning(
+            'The user table does not exist. Run the migrations and then '
+            '"flask ensure-admin".')
+    elif created:
+        server.log.info('Created the admin user.')
+
+
+def post_fork(server, worker):
+    """Give each worker its own database and APNs connections."""
+    from slobsterble.app import apns, db
+    from slobsterble.wsgi import app
+    with app.app_context():
+        db.engine.dispose()
+        apns.refresh_client()
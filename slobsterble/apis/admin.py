@@ -8,6 +8,9 @@ from flask import (
 from flask_admin.contrib.sqla import ModelView
 from flask_login import current_user as session_current_user
 
+from slobsterble.apis.auth import invalidate_default_ids
+from slobsterble.apis.dictionary import invalidate_entry_cache
+
 
 class SlobsterbleModelView(ModelView):
     """Model view class with authentication."""
@@ -20,3 +23,23 @@ class SlobsterbleModelView(ModelView):
     def inaccessible_callback(self, name, **kwargs):
         """Redirect to login page if the user is not authorized."""
         return redirect(url_for('adminloginview', next=request.url))
+
+    def after_model_change(self, form, model, is_created):
+        """
+        Forget the cached defaults and words in case they changed.
+
+        The caches are per process, so only the worker serving the admin
+        request forgets them. The other workers refetch cached words once
+        they expire and the defaults when they restart.
+        """
+        invalidate_default_ids()
+        invalidate_entry_cache()
+
+    def after_model_delete(self, model):
+        """
+        Forget the cached defaults and words in case they were deleted.
+
+        As in after_model_change, only this worker's caches are cleared.
+        """
+        invalidate_default_ids()
+        invalidate_entry_cache()
@@ -1,30 +1,40 @@
 """Handler for user authentication."""
 
 import datetime
+import threading
+import time
 
 import flask_login
 from flask import (
     Response,
+    current_app,
     flash,
     redirect,
     render_template,
     request,
     url_for,
-    jsonify,
 )
 from flask_jwt_extended import (
     create_access_token,
     create_refresh_token,
     current_user,
-    decode_token,
     jwt_required,
     get_jwt,
 )
 from flask_jwt_extended.config import config as jwt_config
+from flask_limiter.util import get_remote_address
 from flask_restful import Resource
-from werkzeug.security import generate_password_hash
+from sqlalchemy import func, lambda_stmt, literal, select, union_all, update
+from sqlalchemy.exc import IntegrityError
 
-from slobsterble.app import db
+from slobsterble.app import db, limiter
+from slobsterble.constants import (
+    DISPLAY_NAME_LENGTH_MAX,
+    LOGIN_RATE_LIMIT,
+    PASSWORD_LENGTH_MAX,
+    REGISTER_RATE_LIMIT,
+    USERNAME_LENGTH_MAX,
+)
 from slobsterble.models import (
     BoardLayout,
     Device,
@@ -34,6 +44,174 @@ from slobsterble.models import (
     User,
 )
 from slobsterble.forms import LoginForm, RegisterForm
+from slobsterble.utilities.db_utilities import upsert
+from slobsterble.utilities.json_utilities import json_response
+from slobsterble.utilities.password_utilities import (
+    check_password,
+    dummy_password_hash,
+    hash_password,
+    password_needs_rehash,
+)
+
+DEFAULT_DICTIONARY_ID = 2
+DEFAULT_BOARD_LAYOUT_NAME = 'Classic'
+DEFAULT_DISTRIBUTION_NAME = 'Classic'
+REGISTER_FIELDS = frozenset(
+    ['username', 'password', 'confirmed_password', 'display_name'])
+
+_default_ids = None
+_default_ids_lock = threading.Lock()
+
+# Access tokens handed out by TokenRefreshView, keyed by user id and refresh
+# token iat. A cached token is reused while at least half its lifetime is
+# left, so frequent refreshes do not each sign a new token.
+ACCESS_TOKEN_CACHE_SIZE_MAX = 10000
+_access_token_cache = {}
+_access_token_cache_lock = threading.Lock()
+
+INCORRECT_CREDENTIALS_MESSAGE = 'Incorrect username or password'
+BAD_REGISTER_REQUEST_MESSAGE = 'Bad request'
+USERNAME_TAKEN_MESSAGE = 'User with this username already exists.'
+
+
+def get_default_ids():
+    """
+    Get the ids of the default dictionary, board layout and distribution.
+
+    The ids are fetched once per process and cached. Each worker process
+    keeps its own copy, so a worker only sees a changed default after
+    restarting or serving the admin change itself. Return None if any of the
+    defaults does not exist.
+    """
+    global _default_ids
+    with _default_ids_lock:
+        if _default_ids is None:
+            statement = union_all(
+                select(literal('dictionary'), Dictionary.id).where(
+                    Dictionary.id == DEFAULT_DICTIONARY_ID),
+                select(literal('board_layout'), BoardLayout.id).where(
+                    BoardLayout.name == DEFAULT_BOARD_LAYOUT_NAME),
+                select(literal('distribution'), Distribution.id).where(
+                    Distribution.name == DEFAULT_DISTRIBUTION_NAME))
+            found_ids = dict(db.session.execute(statement).all())
+            default_ids = tuple(
+                found_ids.get(kind)
+                for kind in ('dictionary', 'board_layout', 'distribution'))
+            if None in default_ids:
+                return None
+            _default_ids = default_ids
+        return _default_ids
+
+
+def _password_error(password):
+    """
+    Get the reason that bcrypt cannot hash the whole password.
+
+    Return None if it can.
+    """
+    if len(password.encode('utf-8')) > PASSWORD_LENGTH_MAX:
+        return 'Password must be at most %d bytes long.' % \
+            PASSWORD_LENGTH_MAX
+    if '\0' in password:
+        return 'Password must not contain null characters.'
+    return None
+
+
+def _registration_error(username, password, confirmed_password,
+                        display_name):
+    """
+    Get the reason that registration details are invalid.
+
+    Only the checks that need neither the database nor a password hash are
+    made. Return None if the details pass them.
+    """
+    if password != confirmed_password:
+        return 'Passwords do not match.'
+    if not 0 < len(username) <= USERNAME_LENGTH_MAX:
+        return 'Username must have between 1 and %d characters.' % \
+            USERNAME_LENGTH_MAX
+    password_error = _password_error(password)
+    if password_error is not None:
+        return password_error
+    if not 0 < len(display_name) <= DISPLAY_NAME_LENGTH_MAX:
+        return 'Display name must have between 1 and %d characters.' % \
+            DISPLAY_NAME_LENGTH_MAX
+    return None
+
+
+def _invalid_refresh_token_response():
+    """Build the response to an invalidated refresh token."""
+    return Response(status=401)
+
+
+def _incorrect_credentials_response():
+    """Build the response to a failed login."""
+    return Response(INCORRECT_CREDENTIALS_MESSAGE, status=401)
+
+
+def _bad_register_request_response():
+    """Build the response to a malformed registration request."""
+    return Response(BAD_REGISTER_REQUEST_MESSAGE, status=401,
+                    mimetype='application/json')
+
+
+def _username_taken_response():
+    """Build the response to a registration with a taken username."""
+    return Response(USERNAME_TAKEN_MESSAGE, status=400)
+
+
+def _login_username_key():
+    """
+    Rate limit logins by the username tried, or else by the client.
+
+    The username is read from a JSON body or from a submitted form. This
+    limit is applied together with one by the client's address.
+    """
+    username = (request.get_json(silent=True) or {}).get('username')
+    if username is None:
+        username = request.form.get('username')
+    if isinstance(username, str) and username:
+        return 'username:' + username.lower()
+    return get_remote_address()
+
+
+def _username_taken(username):
+    """Return True iff a user with the username exists."""
+    return db.session.query(
+        User.query.filter_by(username=username).exists()).scalar()
+
+
+def invalidate_default_ids():
+    """
+    Clear this process's cached default ids so that they are fetched again.
+
+    The ids cached by other worker processes are left as they are.
+    """
+    global _default_ids
+    with _default_ids_lock:
+        _default_ids = None
+
+
+def _token_payload(token, expiration_timestamp):
+    """Build the response data for a token."""
+    return {'token': token, 'expiration_date': expiration_timestamp}
+
+
+def _cache_access_token(cache_key, access_token, expiration_timestamp):
+    """
+    Remember an access token minted for a refresh token.
+
+    Expired tokens are dropped whenever the cache reaches its size limit.
+    """
+    with _access_token_cache_lock:
+        if len(_access_token_cache) >= ACCESS_TOKEN_CACHE_SIZE_MAX:
+            now = time.time()
+            for key, (_, expiration) in list(_access_token_cache.items()):
+                if expiration <= now:
+                    del _access_token_cache[key]
+            if len(_access_token_cache) >= ACCESS_TOKEN_CACHE_SIZE_MAX:
+                _access_token_cache.clear()
+        _access_token_cache[cache_key] = (access_token, expiration_timestamp)
 
 
 class TokenRefreshView(Resource):
@@ -46,59 +224,82 @@ class TokenRefreshView(Resource):
         refresh_token_iat = jwt.get('iat', 0)
         if current_user.refresh_token_iat != refresh_token_iat:
             # The refresh token has been invalidated by a user logout.
-            return Response(status=401)
-        access_token = create_access_token(identity=current_user, fresh=False)
-        access_expiration_timestamp = \
-            decode_token(access_token).get('iat') + jwt_config.access_expires.seconds
-        data = {
-            'token': access_token,
-            'expiration_date': access_expiration_timestamp
-        }
-        return jsonify(data)
+            return _invalid_refresh_token_response()
+        now_timestamp = int(time.time())
+        cache_key = (current_user.id, refresh_token_iat)
+        with _access_token_cache_lock:
+            cached = _access_token_cache.get(cache_key)
+        remaining_seconds_min = jwt_config.access_expires.total_seconds() / 2
+        if cached is not None and cached[1] - now_timestamp > remaining_seconds_min:
+            access_token, access_expiration_timestamp = cached
+        else:
+            access_token = create_access_token(
+                identity=current_user.id, fresh=False,
+                additional_claims={'iat': now_timestamp})
+            access_expiration_timestamp = \
+                now_timestamp + jwt_config.access_expires.seconds
+            _cache_access_token(
+                cache_key, access_token, access_expiration_timestamp)
+        return json_response(_token_payload(access_token, access_expiration_timestamp))
 
 
 class LoginView(Resource):
+    decorators = [
+        limiter.limit(LOGIN_RATE_LIMIT, key_func=get_remote_address),
+        limiter.limit(LOGIN_RATE_LIMIT, key_func=_login_username_key),
+    ]
 
     @staticmethod
     def post():
-        username = request.json.get("username", None)
-        password = request.json.get("password", None)
-        device_token = request.json.get("deviceToken", None)
+        data = request.get_json(silent=True) or {}
+        username = data.get('username')
+        password = data.get('password')
+        device_token = data.get('deviceToken')
+        if not isinstance(username, str) or not isinstance(password, str):
+            return _incorrect_credentials_response()
 
-        user = User.query.filter_by(username=username).one_or_none()
-        if not user or not user.check_password(password):
-            return Response('Incorrect username or password', status=401)
+        credentials = db.session.execute(lambda_stmt(
+            lambda: select(User.id, User.password_hash).where(
+                User.username == username))).one_or_none()
+        # Check a password even for unknown usernames so that the response
+        # time does not reveal which usernames exist.
+        password_valid = check_password(
+            credentials.password_hash if credentials else dummy_password_hash(),
+            password)
+        if not credentials or not password_valid:
+            return _incorrect_credentials_response()
 
         now = datetime.datetime.now(datetime.timezone.utc)
-        access_token = create_access_token(identity=user, fresh=True)
+        # Pin the iat claim so that it is known without decoding the tokens.
+        refresh_iat = int(now.timestamp())
+        access_token = create_access_token(
+            identity=credentials.id, fresh=True,
+            additional_claims={'iat': refresh_iat})
         access_expiration_date = now + jwt_config.access_expires
-        refresh_token = create_refresh_token(identity=user)
-        refresh_iat = decode_token(refresh_token).get('iat', 0)
-        user.refresh_token_iat = refresh_iat
+        refresh_token = create_refresh_token(
+            identity=credentials.id, additional_claims={'iat': refresh_iat})
+        user_values = {'refresh_token_iat': refresh_iat}
+        if (password_needs_rehash(credentials.password_hash)
+                and _password_error(password) is None):
+            # Upgrade a hash of an older method while the password is known.
+            user_values['password_hash'] = hash_password(password)
+        db.session.execute(update(User).where(
+            User.id == credentials.id).values(**user_values))
         refresh_expiration_date = now + jwt_config.refresh_expires
         data = {
-            'access_token': {
-                'token': access_token,
-                'expiration_date': access_expiration_date.timestamp(),
-            },
-            'refresh_token': {
-                'token': refresh_token,
-                'expiration_date': refresh_expiration_date.timestamp(),
-            }
+            'access_token': _token_payload(
+                access_token, access_expiration_date.timestamp()),
+            'refresh_token': _token_payload(
+                refresh_token, refresh_expiration_date.timestamp()),
         }
         if device_token is not None:
-            device_query = db.session.query(Device).filter_by(
-                user_id=user.id,
-                device_token=device_token
-            ).one_or_none()
-            if device_query is None:
-                device = Device(user=user, device_token=device_token,
-                                refreshed=datetime.datetime.now())
-                db.session.add(device)
-            else:
-                device_query.refreshed = datetime.datetime.now()
+            # Let the database timestamp the device, as the column's server
+            # default does for new rows.
+            upsert(db.session, Device, ['user_id', 'device_token'],
+                   user_id=credentials.id, device_token=device_token,
+                   refreshed=func.now())
         db.session.commit()
-        return jsonify(data)
+        return json_response(data)
 
 
 class LogoutView(Resource):
@@ -107,12 +308,18 @@ class LogoutView(Resource):
     @jwt_required()
     def post():
         """Log the user out."""
-        current_user.token_iat = None
+        current_user.refresh_token_iat = None
         db.session.commit()
         return Response("Success")
 
 
 class AdminLoginView(Resource):
+    decorators = [
+        limiter.limit(LOGIN_RATE_LIMIT, methods=['POST'],
+                      key_func=get_remote_address),
+        limiter.limit(LOGIN_RATE_LIMIT, methods=['POST'],
+                      key_func=_login_username_key),
+    ]
 
     @staticmethod
     def get():
@@ -124,11 +331,20 @@ class AdminLoginView(Resource):
     def post():
         form = LoginForm()
         if form.validate_on_submit():
-            user = User.query.filter_by(username=form.username.data).first()
-            if user is None or not user.check_password(form.password.data):
+            username = form.username.data
+            user = db.session.execute(lambda_stmt(
+                lambda: select(User).where(
+                    User.username == username))).scalar_one_or_none()
+            password_valid = check_password(
+                user.password_hash if user else dummy_password_hash(),
+                form.password.data)
+            if user is None or not password_valid:
                 flash('Invalid username or password')
                 return redirect(url_for('auth.admin_login'))
-            response = redirect(url_for('admin.index'))
+            if 'admin' in current_app.blueprints:
+                response = redirect(url_for('admin.index'))
+            else:
+                response = redirect(url_for('indexview'))
             flask_login.login_user(user)
             return response
         return Response(
@@ -145,6 +361,7 @@ class AdminLogoutView(Resource):
 
 
 class WebsiteRegisterView(Resource):
+    decorators = [limiter.limit(REGISTER_RATE_LIMIT, methods=['POST'])]
 
     @staticmethod
     def get():
@@ -155,67 +372,80 @@ class WebsiteRegisterView(Resource):
     def post():
         form = RegisterForm()
         if form.validate_on_submit():
-            existing_user = User.query.filter_by(
-                username=form.username.data).first()
-            if existing_user:
-                flash('User with this username already exists.')
+            error = _registration_error(
+                form.username.data, form.password.data,
+                form.confirm_password.data, form.display_name.data)
+            if error is not None:
+                flash(error)
+                return Response(
+                    render_template('auth/register.html', title='Register',
+                                    form=form), status=200)
+            if _username_taken(form.username.data):
+                flash(USERNAME_TAKEN_MESSAGE)
                 return Response(
                     render_template('auth/register.html', title='Register',
                                     form=form), status=200)
-            if form.password.data != form.confirm_password.data:
-                flash('Passwords do not match.')
+            default_ids = get_default_ids()
+            if default_ids is None:
+                flash('Internal server error.')
                 return Response(
                     render_template('auth/register.html', title='Register',
                                     form=form), status=200)
+            dictionary_id, board_layout_id, distribution_id = default_ids
             new_user = User(username=form.username.data,
-                            password_hash=generate_password_hash(form.password.data))
+                            password_hash=hash_password(form.password.data))
             db.session.add(new_user)
-            default_dictionary = db.session.query(Dictionary).filter_by(
-                id=2).first()
-            default_board_layout = db.session.query(BoardLayout).filter_by(
-                name='Classic').first()
-            default_distribution = db.session.query(Distribution).filter_by(
-                name='Classic').first()
             new_player = Player(user=new_user, display_name=form.display_name.data,
-                                dictionary=default_dictionary,
-                                board_layout=default_board_layout,
-                                distribution=default_distribution)
+                                dictionary_id=dictionary_id,
+                                board_layout_id=board_layout_id,
+                                distribution_id=distribution_id)
             db.session.add(new_player)
-            db.session.commit()
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Another registration took the username after the check.
+                db.session.rollback()
+                flash(USERNAME_TAKEN_MESSAGE)
+                return Response(
+                    render_template('auth/register.html', title='Register',
+                                    form=form), status=200)
             return redirect(url_for('indexview'))
         flash('Invalid form submission')
         return Response(render_template('auth/register.html', title='Register', form=form), status=200)
 
 
 class RegisterView(Resource):
+    decorators = [limiter.limit(REGISTER_RATE_LIMIT)]
 
     @staticmethod
     def post():
-        data = request.get_json()
-        expected_fields = ['username', 'password',
-                           'confirmed_password', 'display_name']
-        if not all([field in data for field in expected_fields]):
-            return Response('Bad request', status=401,
-                            mimetype='application/json')
-        existing_user = User.query.filter_by(username=data['username']).first()
-        if existing_user:
-            return Response('User with this username already exists.', status=400)
-        if data['password'] != data['confirmed_password']:
-            return Response('Passwords do not match.', status=400)
+        data = request.get_json(silent=True) or {}
+        if not REGISTER_FIELDS.issubset(data) or not all(
+                isinstance(data[field], str) for field in REGISTER_FIELDS):
+            return _bad_register_request_response()
+        error = _registration_error(
+            data['username'], data['password'], data['confirmed_password'],
+            data['display_name'])
+        if error is not None:
+            return Response(error, status=400)
+        if _username_taken(data['username']):
+            return _username_taken_response()
+        default_ids = get_default_ids()
+        if default_ids is None:
+            return Response('Internal server error.', status=400)
+        dictionary_id, board_layout_id, distribution_id = default_ids
         new_user = User(username=data['username'],
-                        password_hash=generate_password_hash(data['password']))
+                        password_hash=hash_password(data['password']))
         db.session.add(new_user)
-        default_dictionary = db.session.query(Dictionary).filter_by(id=2).first()
-        default_board_layout = db.session.query(BoardLayout).filter_by(
-            name='Classic').first()
-        default_distribution = db.session.query(Distribution).filter_by(
-            name='Classic').first()
-        if default_dictionary is None:
-            return Response('Internal server error.', status=400)
         new_player = Player(user=new_user, display_name=data['display_name'],
-                            dictionary=default_dictionary,
-                            board_layout=default_board_layout,
-                            distribution=default_distribution)
+                            dictionary_id=dictionary_id,
+                            board_layout_id=board_layout_id,
+                            distribution_id=distribution_id)
         db.session.add(new_player)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another registration took the username after the check.
+            db.session.rollback()
+            return _username_taken_response()
         return Response('Success!', status=200)
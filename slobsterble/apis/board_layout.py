@@ -1,9 +1,10 @@
 """API for setting a user's preferred Board Layout."""
 
-from flask import jsonify, request, Response
+from flask import request, Response
 from flask_jwt_extended import jwt_required, current_user
 from flask_restful import Resource
-from jsonschema import validate as schema_validate, ValidationError
+from jsonschema import ValidationError
+from sqlalchemy import and_
 from sqlalchemy.orm import joinedload
 
 from slobsterble.app import db
@@ -16,7 +17,9 @@ from slobsterble.constants import (
     MULTIPLIER_MAX,
 )
 from slobsterble.models import BoardLayout, Modifier, Player, PositionedModifier
-from slobsterble.utilities.db_utilities import fetch_or_create
+from slobsterble.utilities.db_utilities import fetch_or_create_many
+from slobsterble.utilities.json_utilities import json_response
+from slobsterble.utilities.schema_utilities import compile_schema
 
 
 BOARD_LAYOUT_SCHEMA = {
@@ -72,6 +75,26 @@ BOARD_LAYOUT_SCHEMA = {
     },
 }
 
+BOARD_LAYOUT_VALIDATOR = compile_schema(BOARD_LAYOUT_SCHEMA)
+
+
+def serialize_board_layout(board_layout):
+    """Serialize a board layout and the modifiers placed on it."""
+    return {
+        'name': board_layout.name,
+        'rows': board_layout.rows,
+        'columns': board_layout.columns,
+        'modifiers': [
+            {'row': positioned_modifier.row,
+             'column': positioned_modifier.column,
+             'modifier': {
+                 'letter_multiplier':
+                     positioned_modifier.modifier.letter_multiplier,
+                 'word_multiplier':
+                     positioned_modifier.modifier.word_multiplier}}
+            for positioned_modifier in board_layout.modifiers],
+    }
+
 
 class BoardLayoutView(Resource):
 
@@ -81,17 +104,10 @@ class BoardLayoutView(Resource):
         """Get the player's current board layout."""
         player = db.session.query(Player).filter_by(
             user_id=current_user.id).options(
-                joinedload(Player.board_layout).subqueryload(
+                joinedload(Player.board_layout).selectinload(
                     BoardLayout.modifiers).joinedload(
                     PositionedModifier.modifier)).one()
-        serialized_data = player.serialize(
-            override_mask={
-                'Player': ['board_layout'],
-                'BoardLayout': ['name', 'rows', 'columns', 'modifiers'],
-                'PositionedModifier': ['row', 'column', 'modifier'],
-                'Modifier': ['letter_multiplier', 'word_multiplier'],
-            })
-        return jsonify(serialized_data['board_layout'])
+        return json_response(serialize_board_layout(player.board_layout))
 
     @staticmethod
     @jwt_required()
@@ -99,7 +115,7 @@ class BoardLayoutView(Resource):
         """Update the player's board layout."""
         data = request.get_json()
         try:
-            schema_validate(data, BOARD_LAYOUT_SCHEMA)
+            BOARD_LAYOUT_VALIDATOR.validate(data)
         except ValidationError:
             return Response('Data does not conform to the schema.', status=400)
         if data['rows'] % 2 != 1:
@@ -113,28 +129,33 @@ class BoardLayoutView(Resource):
             return Response(
                 'Multiple modifiers given for the same row and column.',
                 status=400)
-        player = db.session.query(Player).filter_by(
-            user_id=current_user.id).joinedload(Player.board_layout).one()
-        board_layout = db.session.query(BoardLayout).filter_by(
-            name=data['name'], creator_id=player.id).one_or_none()
-        is_new_layout = board_layout is not None
-        if board_layout is None:
+        player, board_layout = db.session.query(Player, BoardLayout).outerjoin(
+            BoardLayout, and_(BoardLayout.creator_id == Player.id,
+                              BoardLayout.name == data['name'])).filter(
+            Player.user_id == current_user.id).one()
+        is_new_layout = board_layout is None
+        if is_new_layout:
             board_layout = BoardLayout(
-                name=data['name'], rows=data['rows'], columns=data['columns'])
-        modifiers = []
-        for modifier_data in data['layout']:
-            modifier = fetch_or_create(
-                db.session, Modifier,
-                letter_multiplier=modifier_data['letter_multiplier'],
-                word_multiplier=modifier_data['word_multiplier'])
-            positioned_modifier = fetch_or_create(
-                db.session, PositionedModifier,
-                modifier_id=modifier.id,
-                row=modifier_data['row'], column=modifier_data['column'])
-            modifiers.append(positioned_modifier)
-        board_layout.modifiers = modifiers
+                name=data['name'], rows=data['rows'], columns=data['columns'],
+                creator_id=player.id)
+        modifiers = fetch_or_create_many(
+            db.session, Modifier, ['letter_multiplier', 'word_multiplier'],
+            {(modifier_data['letter_multiplier'],
+              modifier_data['word_multiplier'])
+             for modifier_data in data['layout']})
+        positioned_keys = [
+            (modifiers[(modifier_data['letter_multiplier'],
+                        modifier_data['word_multiplier'])].id,
+             modifier_data['row'], modifier_data['column'])
+            for modifier_data in data['layout']]
+        positioned_modifiers = fetch_or_create_many(
+            db.session, PositionedModifier, ['modifier_id', 'row', 'column'],
+            positioned_keys)
+        board_layout.modifiers = [
+            positioned_modifiers[key] for key in positioned_keys]
         if is_new_layout:
             db.session.add(board_layout)
         player.board_layout = board_layout
         db.session.commit()
+        return Response('Successfully updated the board layout.')
 
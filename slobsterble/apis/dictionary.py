@@ -1,11 +1,79 @@
 """API for checking words in the dictionary."""
 
-from flask import jsonify, Response
+import threading
+import time
+
+from flask import Response
 from flask_jwt_extended import jwt_required, current_user
 from flask_restful import Resource
 
 from slobsterble.app import db
-from slobsterble.models import Dictionary, Entry, Game, GamePlayer, Player
+from slobsterble.models import Entry, Game, GamePlayer, Player
+from slobsterble.models.dictionary import entries
+from slobsterble.utilities.json_utilities import json_response
+
+ENTRY_CACHE_SIZE_MAX = 65536
+# The cache is per process and an admin change only clears the cache of the
+# worker that served it, so the other workers refetch an entry this long
+# after caching it.
+ENTRY_CACHE_TTL_SECONDS = 300
+
+_entry_cache = {}
+_entry_cache_lock = threading.Lock()
+
+
+def _cache_entry(cache_key, serialized_entry, expiration):
+    """
+    Remember a serialized entry until its expiration.
+
+    Expired entries are dropped whenever the cache reaches its size limit.
+    """
+    with _entry_cache_lock:
+        if len(_entry_cache) >= ENTRY_CACHE_SIZE_MAX:
+            now = time.monotonic()
+            for key, (_, cached_expiration) in list(_entry_cache.items()):
+                if cached_expiration <= now:
+                    del _entry_cache[key]
+            if len(_entry_cache) >= ENTRY_CACHE_SIZE_MAX:
+                _entry_cache.clear()
+        _entry_cache[cache_key] = (serialized_entry, expiration)
+
+
+def lookup_entry(dictionary_id, word):
+    """
+    Get the serialized entry for the word in the dictionary.
+
+    Found entries are cached per process for ENTRY_CACHE_TTL_SECONDS. Words
+    that are not found are not cached, so that a word added to a dictionary
+    is accepted by every worker straight away.
+    """
+    cache_key = (dictionary_id, word)
+    now = time.monotonic()
+    with _entry_cache_lock:
+        cached = _entry_cache.get(cache_key)
+    if cached is not None and cached[1] > now:
+        return cached[0]
+    entry = db.session.query(Entry).join(
+        entries, entries.c.entry_id == Entry.id
+    ).filter(
+        entries.c.dictionary_id == dictionary_id,
+        Entry.word == word
+    ).first()
+    if entry is None:
+        return {'word': None, 'definition': None}
+    serialized_entry = entry.serialize()
+    _cache_entry(cache_key, serialized_entry, now + ENTRY_CACHE_TTL_SECONDS)
+    return serialized_entry
+
+
+def invalidate_entry_cache():
+    """
+    Forget the entry lookups cached by this process.
+
+    Other worker processes keep their cached entries until they expire.
+    """
+    with _entry_cache_lock:
+        _entry_cache.clear()
 
 
 class DictionaryView(Resource):
@@ -14,25 +82,12 @@ class DictionaryView(Resource):
     @jwt_required()
     def get(game_id, word):
         """Check if a word is in the dictionary."""
-        has_game_access = db.session.query(Game).filter(
+        dictionary_id = db.session.query(Game.dictionary_id).filter(
             Game.id == game_id
         ).join(
             Game.game_players,
             GamePlayer.player
-        ).filter(Player.user_id == current_user.id).one_or_none()
-        if not has_game_access:
+        ).filter(Player.user_id == current_user.id).scalar()
+        if dictionary_id is None:
             return Response(status=401)
-
-        game_entry_tuple = db.session.query(Game, Entry).filter(
-            Game.id == game_id
-        ).join(
-            Game.dictionary,
-            Dictionary.entries
-        ).filter(
-            Entry.word == word
-        ).first()
-        if game_entry_tuple is None:
-            return jsonify({'word': None, 'definition': None})
-        game, entry = game_entry_tuple
-
-        return jsonify(entry.serialize())
+        return json_response(lookup_entry(dictionary_id, word))
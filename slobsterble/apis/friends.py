@@ -1,14 +1,18 @@
 """API view for getting and adding friends."""
 
-from flask import jsonify, request, Response
+from flask import request, Response
 from flask_jwt_extended import jwt_required, current_user
 from flask_restful import Resource
-from sqlalchemy.orm import subqueryload
-from jsonschema import validate as schema_validate, ValidationError
+from sqlalchemy.orm import selectinload
+from jsonschema import ValidationError
 
 from slobsterble.app import db
 from slobsterble.constants import FRIEND_KEY_LENGTH, FRIEND_KEY_CHARACTERS
 from slobsterble.models import Player
+from slobsterble.models.user import friends
+from slobsterble.utilities.db_utilities import insert_rows_or_ignore
+from slobsterble.utilities.json_utilities import json_response
+from slobsterble.utilities.schema_utilities import compile_schema
 
 
 ADD_FRIEND_SCHEMA = {
@@ -24,6 +28,8 @@ ADD_FRIEND_SCHEMA = {
     }
 }
 
+ADD_FRIEND_VALIDATOR = compile_schema(ADD_FRIEND_SCHEMA)
+
 
 class FriendsView(Resource):
 
@@ -33,7 +39,7 @@ class FriendsView(Resource):
         """Get the current user's friend key and their friends."""
         current_player = db.session.query(Player).filter_by(
             user_id=current_user.id).options(
-            subqueryload(Player.friends)).one()
+            selectinload(Player.friends)).one()
         data = {
             'friends': [
                 {'player_id': player.id, 'display_name': player.display_name}
@@ -41,39 +47,37 @@ class FriendsView(Resource):
             ],
             'friend_key': current_player.friend_key
         }
-        return jsonify(data)
+        return json_response(data)
 
     @staticmethod
     @jwt_required()
     def post():
         data = request.get_json()
         try:
-            schema_validate(data, ADD_FRIEND_SCHEMA)
+            ADD_FRIEND_VALIDATOR.validate(data)
         except ValidationError:
             return Response('Data does not conform to the schema.', status=400)
-        current_player = db.session.query(Player).filter_by(
-            user_id=current_user.id).options(
-            subqueryload(Player.friends)).one()
-        friend_player = db.session.query(Player).filter_by(
-            friend_key=data['friend_key']).options(
-            subqueryload(Player.friends)).one_or_none()
+        current_player_id, current_friend_key = db.session.query(
+            Player.id, Player.friend_key).filter_by(
+            user_id=current_user.id).one()
+        if current_friend_key == data['friend_key']:
+            return Response('You cannot add yourself as a friend.', status=400)
+        friend_player = db.session.query(
+            Player.id, Player.display_name).filter_by(
+            friend_key=data['friend_key']).one_or_none()
         if friend_player is None:
             return Response(
                 'No player has friend key %s.' % data['friend_key'], status=400)
-        if current_player.id == friend_player.id:
-            return Response('You cannot add yourself as a friend.', status=400)
-        already_friends = True
-        if current_player not in friend_player.friends:
-            friend_player.friends.append(current_player)
-            already_friends = False
-        if friend_player not in current_player.friends:
-            current_player.friends.append(friend_player)
-            already_friends = False
-        if already_friends:
+        # Add both directions of the friendship in one statement. Nothing is
+        # inserted only if the players were already friends both ways.
+        inserted_count = insert_rows_or_ignore(
+            db.session, friends, ['my_player_id', 'friend_player_id'],
+            [{'my_player_id': current_player_id,
+              'friend_player_id': friend_player.id},
+             {'my_player_id': friend_player.id,
+              'friend_player_id': current_player_id}])
+        if inserted_count == 0:
             return Response('You are already friends with %s.' %
                             friend_player.display_name, status=400)
         db.session.commit()
         return Response('Success.', status=200)
-
-
-
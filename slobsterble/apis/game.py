@@ -1,9 +1,11 @@
 """Views related to game play."""
 
 import sqlalchemy.orm.exc
-from flask import Response, request, jsonify
+from flask import Response, request
 from flask_restful import Resource
 from flask_jwt_extended import jwt_required, current_user
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, raiseload, selectinload
 
 import slobsterble.api_exceptions
 from slobsterble.app import db
@@ -16,8 +18,69 @@ from slobsterble.game_play_controller import (
     fetch_game_state,
     get_game_player,
 )
-from slobsterble.models import Move
-from slobsterble.notifications.notify import notify_next_player
+from slobsterble.models import (
+    BoardLayout,
+    Game,
+    GamePlayer,
+    Move,
+    PlayedTile,
+    Player,
+    PositionedModifier,
+    TileCount,
+)
+from slobsterble.models.game import move_exchanged_tiles
+from slobsterble.notifications.notify import (
+    notify_next_player,
+    submit_notification,
+)
+from slobsterble.utilities.json_utilities import json_response
+
+
+def _serialize_tile(tile):
+    """Serialize the displayed fields of a tile."""
+    return {'letter': tile.letter, 'is_blank': tile.is_blank,
+            'value': tile.value}
+
+
+def serialize_game_state(game_state):
+    """
+    Serialize the parts of the game state that every player may see.
+
+    The fields are read straight off the models instead of going through
+    the generic ModelSerializer and an override mask, which inspects every
+    field of every row.
+    """
+    board_layout = game_state.board_layout
+    return {
+        'board_state': [
+            {'tile': _serialize_tile(played_tile.tile),
+             'row': played_tile.row,
+             'column': played_tile.column}
+            for played_tile in game_state.board_state],
+        'game_players': [
+            {'score': game_player.score,
+             'player': {'id': game_player.player.id,
+                        'display_name': game_player.player.display_name},
+             'turn_order': game_player.turn_order}
+            for game_player in sorted(game_state.game_players,
+                                      key=lambda game_player: game_player.turn_order)],
+        'turn_number': game_state.turn_number,
+        'whose_turn_name': game_state.whose_turn_name,
+        'num_tiles_remaining': game_state.num_tiles_remaining,
+        'board_layout': {
+            'rows': board_layout.rows,
+            'columns': board_layout.columns,
+            'modifiers': [
+                {'row': positioned_modifier.row,
+                 'column': positioned_modifier.column,
+                 'modifier': {
+                     'letter_multiplier':
+                         positioned_modifier.modifier.letter_multiplier,
+                     'word_multiplier':
+                         positioned_modifier.modifier.word_multiplier}}
+                for positioned_modifier in board_layout.modifiers],
+        },
+    }
 
 
 class GameView(Resource):
@@ -34,64 +97,100 @@ class GameView(Resource):
         - The logged in user's rack tiles.
         - The number of tiles remaining.
         - Whose turn it is.
+
+        The state only changes when a turn is played, so the response is
+        tagged with the turn number and the viewer. A client polling with
+        a current tag gets a 304 without the game being loaded.
         """
+        game_version = db.session.query(
+            Game.turn_number, GamePlayer.id
+        ).join(
+            Game.game_players,
+            GamePlayer.player
+        ).filter(
+            Game.id == game_id,
+            Player.user_id == current_user.id
+        ).one_or_none()
+        etag = None
+        if game_version is not None:
+            etag = '%d:%d:%d' % (game_id, game_version.turn_number,
+                                 game_version.id)
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+                response.set_etag(etag, weak=True)
+                return response
         try:
-            game_state = fetch_game_state(game_id)
+            game_state = db.session.query(Game).filter(
+                Game.id == game_id).options(
+                    selectinload(Game.game_players).options(
+                        joinedload(GamePlayer.player),
+                        selectinload(GamePlayer.rack).joinedload(
+                            TileCount.tile)),
+                    selectinload(Game.board_state).joinedload(
+                        PlayedTile.tile),
+                    selectinload(Game.bag_tiles),
+                    joinedload(Game.board_layout).selectinload(
+                        BoardLayout.modifiers).joinedload(
+                        PositionedModifier.modifier),
+                    raiseload('*')).one()
         except sqlalchemy.orm.exc.NoResultFound:
             return Response(
                 'Game with id %s not found.' % str(game_id), status=404)
-        if not any(game_player.player.user_id == current_user.id
-                   for game_player in game_state.game_players):
-            return Response('User is not authorized to access this game.',
-                            status=401)
-
-        def _game_player_sort(game_player):
-            return game_player['turn_order']
-
-        serialized_game_state = game_state.serialize(
-            override_mask={'Game': ['board_state', 'game_players',
-                                    'turn_number',
-                                    'whose_turn_name', 'num_tiles_remaining',
-                                    'board_layout'],
-                           'GamePlayer': ['score', 'player', 'turn_order'],
-                           'Player': ['id', 'display_name'],
-                           'PlayedTile': ['tile', 'row', 'column'],
-                           'Tile': ['letter', 'is_blank', 'value'],
-                           'BoardLayout': ['rows', 'columns', 'modifiers'],
-                           'PositionedModifier': ['row', 'column', 'modifier'],
-                           'Modifier': ['letter_multiplier', 'word_multiplier']},
-            sort_keys={'GamePlayer': _game_player_sort})
+        prev_turn_order = None
+        if game_state.turn_number > 0 and game_state.game_players:
+            prev_turn_order = (game_state.turn_number - 1) % len(game_state.game_players)
         current_game_player = None
+        prev_play_player = None
         for game_player in game_state.game_players:
-            if game_player.player.user_id == current_user.id:
+            if (current_game_player is None
+                    and game_player.player.user_id == current_user.id):
                 current_game_player = game_player
-                break
-        serialized_user_rack = current_game_player.serialize(
-            override_mask={'GamePlayer': ['rack'],
-                           'TileCount': ['tile', 'count'],
-                           'Tile': ['letter', 'is_blank', 'value']})
+            if (prev_play_player is None
+                    and game_player.turn_order == prev_turn_order):
+                prev_play_player = game_player
+        if current_game_player is None:
+            db.session.expire_all()
+            return Response('User is not authorized to access this game.',
+                            status=401)
+
+        serialized_prev_move = None
         if game_state.turn_number > 0:
-            prev_turn_order = (game_state.turn_number - 1) % len(game_state.game_players)
-            prev_play_player = game_state.game_players[0]
-            for game_player in game_state.game_players:
-                if game_player.turn_order == prev_turn_order:
-                    prev_play_player = game_player
-                    break
-            prev_move = db.session.query(Move).filter(
+            if prev_play_player is None:
+                prev_play_player = game_state.game_players[0]
+            prev_move = db.session.query(
+                Move.primary_word, Move.score,
+                func.count(move_exchanged_tiles.c.tile_count_id).label(
+                    'exchanged_count')
+            ).outerjoin(
+                move_exchanged_tiles,
+                move_exchanged_tiles.c.move_id == Move.id
+            ).filter(
                 Move.game_player_id == prev_play_player.id,
-                Move.turn_number == game_state.turn_number - 1).one()
+                Move.turn_number == game_state.turn_number - 1
+            ).group_by(Move.id).one()
             serialized_prev_move = {
                 'word': prev_move.primary_word,
                 'score': prev_move.score,
                 'player_id': prev_play_player.player_id,
                 'display_name': prev_play_player.player.display_name,
-                'exchanged_count': len(prev_move.exchanged_tiles)
+                'exchanged_count': prev_move.exchanged_count
             }
-            serialized_game_state['prev_move'] = serialized_prev_move
-        else:
-            serialized_game_state['prev_move'] = None
-        serialized_game_state['rack'] = serialized_user_rack['rack']
-        return jsonify(serialized_game_state)
+        serialized_game_state = {
+            **serialize_game_state(game_state),
+            'prev_move': serialized_prev_move,
+            'rack': [
+                {'tile': _serialize_tile(tile_count.tile),
+                 'count': tile_count.count}
+                for tile_count in current_game_player.rack],
+        }
+        response = json_response(serialized_game_state)
+        # The raiseload above stays on the loaded objects until they are
+        # expired, and would break later lazy loads of them in a session
+        # that outlives the request.
+        db.session.expire_all()
+        if etag is not None:
+            response.set_etag(etag, weak=True)
+        return response
 
     @staticmethod
     @jwt_required()
@@ -122,7 +221,7 @@ class GameView(Resource):
                 secondary_words=secondary_words)
             game_over = state_updater.update_state()
             if not game_over:
-                notify_next_player(game_id)
+                submit_notification(notify_next_player, game_id)
             return Response('Turn played successfully.', status=200)
         except slobsterble.api_exceptions.BaseApiException as play_error:
             return Response(str(play_error), status=play_error.status_code)
@@ -1,10 +1,24 @@
 
-from flask import render_template, Response
+from flask import render_template, Response, session
 from flask_restful import Resource
 
+INDEX_MAX_AGE_SECONDS = 3600
+
+# The rendered index page. It only depends on pending flashed messages, so
+# it is rendered on the first request without any and reused after that.
+_index_html = None
+
 
 class IndexView(Resource):
 
     @staticmethod
     def get():
-        return Response(render_template('index.html'), status=200)
+        global _index_html
+        if '_flashes' in session:
+            return Response(render_template('index.html'), status=200)
+        if _index_html is None:
+            _index_html = render_template('index.html').encode('utf-8')
+        response = Response(_index_html, status=200, mimetype='text/html')
+        response.cache_control.public = True
+        response.cache_control.max_age = INDEX_MAX_AGE_SECONDS
+        return response
@@ -1,6 +1,7 @@
 """API for listing active games."""
 
-from flask import jsonify
+import itertools
+
 from flask_jwt_extended import jwt_required, current_user
 from flask_restful import Resource
 from sqlalchemy import case
@@ -8,6 +9,14 @@ from sqlalchemy import case
 from slobsterble.app import db
 from slobsterble.constants import ACTIVE_GAME_LIMIT
 from slobsterble.models import Game, GamePlayer, Player
+from slobsterble.utilities.json_utilities import json_response
+
+
+def _serialize_time(time):
+    """Serialize a time as an integer timestamp, as ModelSerializer does."""
+    if time is None:
+        return None
+    return int(time.timestamp())
 
 
 class ListGamesView(Resource):
@@ -22,36 +31,63 @@ class ListGamesView(Resource):
         completed (incomplete first) first, and the time that the game was
         started (more recent, first) second.
         """
-        user_games = db.session.query(Game).join(
-            Game.game_players
-        ).join(
-            GamePlayer.player
-        ).filter(
-            Player.user_id == current_user.id
-        ).order_by(
+        game_order = (
             case(
                 [(Game.completed.is_(None), 1)],
                 else_=0
             ),
             Game.completed.desc(),
             Game.started.desc()
+        )
+        # Filter the user's game players on the player foreign key, which
+        # the unique (player_id, game_id) constraint indexes.
+        user_player_id = db.session.query(Player.id).filter(
+            Player.user_id == current_user.id
+        ).scalar_subquery()
+        user_game_ids = db.session.query(Game.id).join(
+            Game.game_players
+        ).filter(
+            GamePlayer.player_id == user_player_id
+        ).order_by(
+            *game_order
         ).limit(
             ACTIVE_GAME_LIMIT
+        ).subquery()
+        # Select just the summarized columns, one row per game player, in
+        # game order and then turn order.
+        rows = db.session.query(
+            Game.id, Game.started, Game.completed, Game.turn_number,
+            GamePlayer.score, GamePlayer.turn_order,
+            Player.id.label('player_id'), Player.display_name
+        ).join(
+            user_game_ids, user_game_ids.c.id == Game.id
+        ).join(
+            Game.game_players
+        ).join(
+            GamePlayer.player
+        ).order_by(
+            *game_order, Game.id, GamePlayer.turn_order, GamePlayer.id
         ).all()
 
-        def _game_player_sort(game_player):
-            return game_player['turn_order']
-
-        def _game_sort(game):
-            return game['completed'] or 0, game['started']
-
-        serialized_games = Game.serialize_list(
-            user_games,
-            override_mask={'Game': ['started', 'completed', 'whose_turn_name',
-                                    'game_players', 'id'],
-                           'GamePlayer': ['score', 'player', 'turn_order'],
-                           'Player': ['display_name', 'id']},
-            sort_keys={
-                'Game': _game_sort,
-                'GamePlayer': _game_player_sort})
-        return jsonify(serialized_games)
+        serialized_games = []
+        for game_id, game_rows in itertools.groupby(rows, lambda row: row.id):
+            game_rows = list(game_rows)
+            game = game_rows[0]
+            turn_order = game.turn_number % len(game_rows)
+            serialized_games.append({
+                'started': _serialize_time(game.started),
+                'completed': _serialize_time(game.completed),
+                'whose_turn_name': next(
+                    (row.display_name for row in game_rows
+                     if row.turn_order == turn_order), None),
+                'game_players': [
+                    {'score': row.score,
+                     'player': {'display_name': row.display_name,
+                                'id': row.player_id},
+                     'turn_order': row.turn_order}
+                    for row in game_rows],
+                'id': game_id,
+            })
+        serialized_games.sort(
+            key=lambda game: (game['completed'] or 0, game['started']))
+        return json_response(serialized_games)
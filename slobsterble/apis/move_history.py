@@ -1,12 +1,48 @@
 """API for viewing the turn history of a game."""
 
-from flask import jsonify, Response
+from flask import Response
 from flask_jwt_extended import jwt_required, current_user
 from flask_restful import Resource
-from sqlalchemy.orm import joinedload, subqueryload
+from sqlalchemy.orm import joinedload, raiseload, selectinload
 
 from slobsterble.app import db
-from slobsterble.models import GamePlayer, Move, Player, TileCount, User
+from slobsterble.models import GamePlayer, Move, TileCount
+from slobsterble.utilities.json_utilities import json_response
+
+# Blank tiles have no letter and are listed after the lettered tiles.
+BLANK_SORT_LETTER = chr(max(ord('z'), ord('Z')) + 1)
+
+
+def _exchanged_sort(exchanged):
+    return exchanged['tile']['letter'] or BLANK_SORT_LETTER
+
+
+def serialize_game_player_moves(game_player):
+    """
+    Serialize a player in a game and the moves that they have played.
+
+    A full game has many moves, so the fields are read straight off the
+    models rather than through the generic ModelSerializer and a mask.
+    """
+    return {
+        'player': {'id': game_player.player.id,
+                   'display_name': game_player.player.display_name},
+        'moves': [
+            {'primary_word': move.primary_word,
+             'secondary_words': move.secondary_words,
+             'exchanged_tiles': sorted(
+                 ({'count': tile_count.count,
+                   'tile': {'letter': tile_count.tile.letter,
+                            'is_blank': tile_count.tile.is_blank,
+                            'value': tile_count.tile.value}}
+                  for tile_count in move.exchanged_tiles),
+                 key=_exchanged_sort),
+             'turn_number': move.turn_number,
+             'score': move.score}
+            for move in sorted(game_player.moves,
+                               key=lambda move: move.turn_number)],
+        'turn_order': game_player.turn_order,
+    }
 
 
 class MoveHistoryView(Resource):
@@ -14,44 +50,24 @@ class MoveHistoryView(Resource):
     @staticmethod
     @jwt_required()
     def get(game_id):
-        """Get the history of turns for a game."""
-        moves_query = db.session.query(GamePlayer).filter(
-            GamePlayer.game_id == game_id).join(
-            GamePlayer.player).join(Player.user).options(
+        """
+        Get the history of turns for a game.
+
+        Access is checked against the loaded game players, whose players
+        are joined in, rather than with separate queries up front.
+        """
+        game_player_moves_list = db.session.query(GamePlayer).filter(
+            GamePlayer.game_id == game_id).options(
             joinedload(GamePlayer.player),
-            subqueryload(GamePlayer.moves).subqueryload(
-                Move.exchanged_tiles).joinedload(TileCount.tile))
-        if moves_query.count() == 0:
+            selectinload(GamePlayer.moves).selectinload(
+                Move.exchanged_tiles).joinedload(TileCount.tile),
+            raiseload('*')).all()
+        if not game_player_moves_list:
             return Response('No game with ID %d.' % game_id, status=400)
-        if moves_query.filter(User.id == current_user.id).count() == 0:
+        if not any(game_player.player.user_id == current_user.id
+                   for game_player in game_player_moves_list):
             # The user is not part of this game.
             return Response('User is not authorized.', status=401)
-        game_player_moves_list = list(moves_query)
-        serialized_moves = []
-
-        def _game_player_sort(game_player):
-            return game_player['turn_order']
-
-        def _move_sort(move):
-            return move['turn_number']
-
-        def _exchanged_sort(exchanged):
-            return exchanged['tile']['letter'] or chr(
-                max(ord('z'), ord('Z')) + 1)
-
-        for game_player_moves in game_player_moves_list:
-            serialized_game_player_moves = game_player_moves.serialize(
-                override_mask={
-                    'GamePlayer': ['player', 'moves', 'turn_order'],
-                    'Move': ['primary_word', 'secondary_words',
-                             'exchanged_tiles', 'turn_number', 'score'],
-                    'Player': ['id', 'display_name']
-                },
-                sort_keys={
-                    'GamePlayer': _game_player_sort,
-                    'Move': _move_sort,
-                    'TileCount': _exchanged_sort
-                }
-            )
-            serialized_moves.append(serialized_game_player_moves)
-        return jsonify(serialized_moves)
+        return json_response([
+            serialize_game_player_moves(game_player)
+            for game_player in game_player_moves_list])
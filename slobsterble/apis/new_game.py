@@ -1,9 +1,9 @@
 """API for creating a new game."""
 
-from flask import jsonify, request, Response
+from flask import request, Response
 from flask_jwt_extended import jwt_required, current_user
 from flask_restful import Resource
-from sqlalchemy.orm import joinedload, subqueryload
+from sqlalchemy.orm import joinedload, selectinload
 
 from slobsterble.app import db
 from slobsterble.game_setup_controller import (
@@ -13,7 +13,11 @@ from slobsterble.game_setup_controller import (
 )
 from slobsterble.models import Distribution, Player
 from slobsterble.api_exceptions import BaseApiException
-from slobsterble.notifications.notify import notify_new_game
+from slobsterble.notifications.notify import (
+    notify_new_game,
+    submit_notification,
+)
+from slobsterble.utilities.json_utilities import json_response
 
 
 class NewGameView(Resource):
@@ -23,7 +27,7 @@ class NewGameView(Resource):
     def get():
         current_player = db.session.query(Player).filter(
             Player.user_id == current_user.id).options(
-            subqueryload(Player.friends)).one()
+            selectinload(Player.friends)).one()
         data = {
             'friends': [
                 {
@@ -32,7 +36,7 @@ class NewGameView(Resource):
                 for player in current_player.friends
             ]
         }
-        return jsonify(data)
+        return json_response(data)
 
     @staticmethod
     @jwt_required()
@@ -45,16 +49,17 @@ class NewGameView(Resource):
             player = db.session.query(Player).filter_by(
                 user_id=current_user.id
             ).options(
-                subqueryload(Player.friends),
-                joinedload(Player.distribution).subqueryload(
+                selectinload(Player.friends),
+                joinedload(Player.distribution).selectinload(
                     Distribution.tile_distribution),
                 joinedload(Player.board_layout)
             ).one()
             stateful_validator = StatefulValidator(data, player)
             stateful_validator.validate()
             state_updater = StateUpdater(data, player)
-            game_id, game_players = state_updater.update_state()
-            notify_new_game(game_id, game_players, player)
+            player_id = player.id
+            game_id, _ = state_updater.update_state()
+            submit_notification(notify_new_game, game_id, player_id)
             return Response(str(game_id), status=200)
         except BaseApiException as new_game_error:
             return Response(
@@ -1,9 +1,10 @@
 """API for retrieving and updating player settings."""
 
-from flask import jsonify, request, Response
+from flask import request, Response
 from flask_jwt_extended import jwt_required, current_user
 from flask_restful import Resource
-from jsonschema import validate as schema_validate, ValidationError
+from jsonschema import ValidationError
+from sqlalchemy.orm import joinedload
 
 from slobsterble.app import db
 from slobsterble.constants import (
@@ -12,6 +13,8 @@ from slobsterble.constants import (
     FRIEND_KEY_LENGTH,
 )
 from slobsterble.models import Player, Dictionary
+from slobsterble.utilities.json_utilities import json_response
+from slobsterble.utilities.schema_utilities import compile_schema
 
 
 PLAYER_SETTINGS_SCHEMA = {
@@ -48,6 +51,24 @@ PLAYER_SETTINGS_SCHEMA = {
     }
 }
 
+PLAYER_SETTINGS_VALIDATOR = compile_schema(PLAYER_SETTINGS_SCHEMA)
+
+
+def _serialize_choice(choice):
+    """Serialize a dictionary, distribution or layout that can be chosen."""
+    return {'id': choice.id, 'name': choice.name}
+
+
+def serialize_player_settings(player):
+    """Serialize the settings that a player can change."""
+    return {
+        'display_name': player.display_name,
+        'dictionary': _serialize_choice(player.dictionary),
+        'friend_key': player.friend_key,
+        'distribution': _serialize_choice(player.distribution),
+        'board_layout': _serialize_choice(player.board_layout),
+    }
+
 
 class PlayerSettingsView(Resource):
 
@@ -56,25 +77,18 @@ class PlayerSettingsView(Resource):
     def get():
         """Get the player's current settings."""
         player = db.session.query(Player).filter_by(
-            user_id=current_user.id).one()
-        player_data = player.serialize(
-            override_mask={
-                'Player': ['display_name', 'dictionary', 'friend_key',
-                           'distribution', 'board_layout'],
-                'Dictionary': ['id', 'name'],
-                'Distribution': ['id', 'name'],
-                'BoardLayout': ['id', 'name']
-            }
-        )
-        dictionaries = db.session.query(Dictionary).all()
-        dictionaries_data = []
-        for dictionary in dictionaries:
-            dictionaries_data.append(
-                dictionary.serialize(
-                    override_mask={'Dictionary': ['id', 'name']}))
+            user_id=current_user.id).options(
+            joinedload(Player.dictionary),
+            joinedload(Player.distribution),
+            joinedload(Player.board_layout)).one()
+        player_data = serialize_player_settings(player)
+        # Select just the columns shown rather than loading the models.
+        dictionaries = db.session.query(Dictionary.id, Dictionary.name).all()
+        dictionaries_data = [
+            _serialize_choice(dictionary) for dictionary in dictionaries]
         data = {'player': player_data,
                 'dictionaries': dictionaries_data}
-        return jsonify(data)
+        return json_response(data)
 
     @staticmethod
     @jwt_required()
@@ -82,19 +96,21 @@ class PlayerSettingsView(Resource):
         """Update the player's current settings."""
         data = request.get_json()
         try:
-            schema_validate(data, PLAYER_SETTINGS_SCHEMA)
+            PLAYER_SETTINGS_VALIDATOR.validate(data)
         except ValidationError:
             return Response('Data does not conform to the schema.', status=400)
         player = db.session.query(Player).filter_by(
             user_id=current_user.id).one()
         player.friend_key = data['friend_key']
-        if data['dictionary']['id'] != player.dictionary.id:
-            chosen_dictionary = db.session.query(Dictionary).filter_by(
-                id=data['dictionary']['id']).one_or_none()
-            if chosen_dictionary is None:
+        # Compare the foreign key so that the dictionary is only looked up
+        # when it changes.
+        if data['dictionary']['id'] != player.dictionary_id:
+            chosen_dictionary_id = db.session.query(Dictionary.id).filter_by(
+                id=data['dictionary']['id']).scalar()
+            if chosen_dictionary_id is None:
                 return Response(
                     'Internal server error. Dictionary not found.', status=400)
-            player.dictionary = chosen_dictionary
+            player.dictionary_id = chosen_dictionary_id
         if data['display_name'] != player.display_name:
             player.display_name = data['display_name']
         db.session.commit()
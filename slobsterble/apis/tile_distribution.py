@@ -1,15 +1,17 @@
 """API for retrieving and updating a user's preferred tile distribution."""
 
-from flask import jsonify, request, Response
+from flask import request, Response
 from flask_jwt_extended import jwt_required, current_user
 from flask_restful import Resource
-from jsonschema import validate as schema_validate, ValidationError
+from jsonschema import ValidationError
 from sqlalchemy.orm import joinedload
 
 from slobsterble.app import db
 from slobsterble.constants import TILE_VALUE_MAX, TILE_COUNT_MAX
 from slobsterble.models import Distribution, Player, Tile, TileCount
 from slobsterble.utilities.db_utilities import fetch_or_create
+from slobsterble.utilities.json_utilities import json_response
+from slobsterble.utilities.schema_utilities import compile_schema
 
 
 TILE_DISTRIBUTION_SCHEMA = {
@@ -47,6 +49,21 @@ TILE_DISTRIBUTION_SCHEMA = {
     }
 }
 
+TILE_DISTRIBUTION_VALIDATOR = compile_schema(TILE_DISTRIBUTION_SCHEMA)
+
+
+def serialize_distribution(distribution):
+    """Serialize a tile distribution and its tile counts."""
+    return {
+        'name': distribution.name,
+        'tile_distribution': [
+            {'tile': {'letter': tile_count.tile.letter,
+                      'value': tile_count.tile.value,
+                      'is_blank': tile_count.tile.is_blank},
+             'count': tile_count.count}
+            for tile_count in distribution.tile_distribution],
+    }
+
 
 class TileDistributionView(Resource):
 
@@ -56,22 +73,10 @@ class TileDistributionView(Resource):
         """Get the player's current preferred tile distribution."""
         player = db.session.query(Player).filter_by(
             user_id=current_user.user_id).options(
-            joinedload(Player.distribution).subqueryload(
+            joinedload(Player.distribution).selectinload(
                 Distribution.tile_distribution).joinedload(TileCount.tile)
         ).one()
-
-        def _letter_sort(tile):
-            return tile['letter'] or chr(max(ord('Z'), ord('z')) + 1)
-
-        serialized_data = player.serialize(
-            override_mask={
-                'Player': ['distribution'],
-                'Distribution': ['name', 'tile_distribution'],
-                'TileCount': ['tile', 'count'],
-                'Tile': ['letter', 'value', 'is_blank'],
-            },
-            sort_keys={'Tile': _letter_sort})
-        return jsonify(serialized_data['distribution'])
+        return json_response(serialize_distribution(player.distribution))
 
     @staticmethod
     @jwt_required()
@@ -79,7 +84,7 @@ class TileDistributionView(Resource):
         """Update the player's current preferred tile distribution."""
         data = request.get_json()
         try:
-            schema_validate(data, TILE_DISTRIBUTION_SCHEMA)
+            TILE_DISTRIBUTION_VALIDATOR.validate(data)
         except ValidationError:
             return Response('Data does not conform to the schema.', status=400)
         letter_set = {tile_count.letter for tile_count in data}
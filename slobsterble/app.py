@@ -3,15 +3,20 @@ import logging
 import os
 import sys
 
-from flask import Flask, Response
+import click
+from flask import Flask, Response, current_app
+from flask.cli import with_appcontext
 from flask_admin import Admin
 from flask_login import LoginManager
 from flask_migrate import Migrate
 from flask_restful import Api
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
-from sqlalchemy import inspect
-from werkzeug.security import generate_password_hash
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Load
+from sqlalchemy.sql.lambdas import StatementLambdaElement
 
 import slobsterble.settings
 from slobsterble.notifications import APNSManager
@@ -23,28 +28,113 @@ migrate = Migrate()
 api = Api()
 jwt = JWTManager()
 apns = APNSManager()
+limiter = Limiter(key_func=get_remote_address)
 logger = logging.getLogger('slobsterble')
 
 
+# Templates rendered by the views, compiled when the app is created. The
+# base template is listed too because Jinja only loads the template that a
+# template extends when it is first rendered.
+PRECOMPILED_TEMPLATES = (
+    'base.html',
+    'auth/admin-login.html',
+    'auth/register.html',
+    'index.html',
+)
+
 LOG_FORMAT = '[%(asctime)s][%(levelname)s][PID-%(process)d][%(threadName)s] %(message)s'
 
 
+def ensure_admin():
+    """
+    Create the admin user if it does not exist already.
+
+    Return None if the user table does not exist yet, and otherwise True
+    iff the admin user was created.
+    """
+    from slobsterble.models import User
+    from slobsterble.utilities.db_utilities import insert_or_ignore
+    from slobsterble.utilities.password_utilities import hash_password
+    if not inspect(db.engine).has_table(User.__tablename__):
+        return None
+    password_hash = current_app.config['ADMIN_PASSWORD_HASH']
+    if password_hash is None:
+        password_hash = hash_password(current_app.config['ADMIN_PASSWORD'])
+    created = insert_or_ignore(
+        db.session, User, ['username'],
+        username=current_app.config['ADMIN_USERNAME'],
+        password_hash=password_hash,
+        activated=True)
+    db.session.commit()
+    return created
+
+
+@click.command('ensure-admin')
+@with_appcontext
+def ensure_admin_command():
+    """Create the admin user if it does not exist already."""
+    created = ensure_admin()
+    if created is None:
+        click.echo('The user table does not exist. Run the migrations first.')
+    elif created:
+        click.echo('Created the admin user.')
+    else:
+        click.echo('The admin user exists already.')
+
+
+@click.command('hash-admin-password')
+@click.password_option()
+@with_appcontext
+def hash_admin_password_command(password):
+    """Print a password hash to use as ADMIN_PASSWORD_HASH."""
+    from slobsterble.utilities.password_utilities import hash_password
+    click.echo(hash_password(password))
+
+
 def init_db(app):
-    """Initialize the database and create the admin user."""
+    """Initialize the database and register the admin user commands."""
     db.init_app(app)
+    app.cli.add_command(ensure_admin_command)
+    app.cli.add_command(hash_admin_password_command)
+    if app.config['TESTING'] or app.debug:
+        init_user_raiseload()
+
+
+def init_user_raiseload():
+    """
+    Raise if a relationship of a queried User is lazily loaded.
+
+    The authentication views read users on every request, so a lazy load
+    there is a query per request. Under test and in debug mode these loads
+    fail loudly and must be replaced by eager loading in the query that
+    needs them. The listener is registered on the shared session once,
+    however many apps are created.
+    """
+    if not event.contains(
+            db.session, 'do_orm_execute', _raise_on_user_lazy_loads):
+        event.listen(db.session, 'do_orm_execute', _raise_on_user_lazy_loads)
+
+
+def _raise_on_user_lazy_loads(orm_execute_state):
+    """Add a raiseload of every User relationship to selects of Users."""
     from slobsterble.models import User
-    with app.app_context():
-        if inspect(db.engine).has_table('User'):
-            admin_user_exists = User.query.filter_by(
-                username=app.config['ADMIN_USERNAME']).one_or_none() is not None
-            if not admin_user_exists:
-                admin_user = User(
-                    username=app.config['ADMIN_USERNAME'],
-                    password_hash=generate_password_hash(
-                        app.config['ADMIN_PASSWORD']),
-                    activated=True)
-                db.session.add(admin_user)
-                db.session.commit()
+    if not (orm_execute_state.is_select
+            and orm_execute_state.is_orm_statement):
+        return
+    statement = orm_execute_state.statement
+    descriptions = getattr(statement, 'column_descriptions', [])
+    if not any(description['entity'] is User
+               for description in descriptions):
+        return
+    if isinstance(statement, StatementLambdaElement):
+        # Extend the lambda rather than its first resolved statement,
+        # which would carry the bound values of its first execution.
+        orm_execute_state.statement = statement.add_criteria(
+            lambda select_statement: select_statement.options(
+                Load(User).raiseload('*')))
+    else:
+        orm_execute_state.statement = statement.options(
+            Load(User).raiseload('*'))
 
 
 def init_migrate(app):
@@ -63,36 +153,23 @@ def init_admin(app):
     """Initialise model views."""
     import slobsterble.models
     from slobsterble.apis import SlobsterbleModelView
-    admin.add_view(
-        SlobsterbleModelView(slobsterble.models.BoardLayout, db.session))
-    admin.add_view(
-        SlobsterbleModelView(slobsterble.models.Device, db.session))
-    admin.add_view(
-        SlobsterbleModelView(slobsterble.models.Dictionary, db.session))
-    admin.add_view(
-        SlobsterbleModelView(slobsterble.models.Distribution, db.session))
-    admin.add_view(
-        SlobsterbleModelView(slobsterble.models.Entry, db.session))
-    admin.add_view(
-        SlobsterbleModelView(slobsterble.models.Game, db.session))
-    admin.add_view(
-        SlobsterbleModelView(slobsterble.models.GamePlayer, db.session))
-    admin.add_view(
-        SlobsterbleModelView(slobsterble.models.Modifier, db.session))
-    admin.add_view(
-        SlobsterbleModelView(slobsterble.models.Move, db.session))
-    admin.add_view(
-        SlobsterbleModelView(slobsterble.models.PositionedModifier, db.session))
-    admin.add_view(
-        SlobsterbleModelView(slobsterble.models.Tile, db.session))
-    admin.add_view(
-        SlobsterbleModelView(slobsterble.models.TileCount, db.session))
-    admin.add_view(
-        SlobsterbleModelView(slobsterble.models.PlayedTile, db.session))
-    admin.add_view(
-        SlobsterbleModelView(slobsterble.models.Player, db.session))
-    admin.add_view(
-        SlobsterbleModelView(slobsterble.models.User, db.session))
+    for model in (
+            slobsterble.models.BoardLayout,
+            slobsterble.models.Device,
+            slobsterble.models.Dictionary,
+            slobsterble.models.Distribution,
+            slobsterble.models.Entry,
+            slobsterble.models.Game,
+            slobsterble.models.GamePlayer,
+            slobsterble.models.Modifier,
+            slobsterble.models.Move,
+            slobsterble.models.PositionedModifier,
+            slobsterble.models.Tile,
+            slobsterble.models.TileCount,
+            slobsterble.models.PlayedTile,
+            slobsterble.models.Player,
+            slobsterble.models.User):
+        admin.add_view(SlobsterbleModelView(model, db.session))
     admin.init_app(app)
 
 
@@ -116,6 +193,10 @@ def init_api(app):
         TokenRefreshView,
         WebsiteRegisterView,
     )
+    from slobsterble.utilities.json_utilities import output_json
+    # Bodies that Flask-RESTful encodes itself, such as error messages, are
+    # encoded like the views' responses.
+    api.representation('application/json')(output_json)
     api.add_resource(IndexView, '/', '/index')
     api.add_resource(AdminLoginView, '/admin-login')
     api.add_resource(AdminLogoutView, '/admin-logout')
@@ -143,11 +224,13 @@ def init_jwt(app):
     @jwt.user_lookup_loader
     def user_lookup_callback(_jwt_header, jwt_data):
         identity = jwt_data["sub"]
-        return User.query.filter_by(id=identity).one_or_none()
+        return db.session.get(User, identity)
 
     @jwt.user_identity_loader
     def user_identity_callback(user):
-        return user.id
+        if isinstance(user, User):
+            return user.id
+        return user
 
     @jwt.unauthorized_loader
     def unauthorized_access_callback(error_string):
@@ -164,6 +247,18 @@ def init_login(app):
         return User.query.get(int(user_id))
 
 
+def init_limiter(app):
+    """
+    Initialize rate limiting for the endpoints that hash passwords.
+
+    Tests log in repeatedly from one address, so under test the limiter is
+    set up and then switched off. The tests of the limits switch it on.
+    """
+    limiter.init_app(app)
+    if app.config['TESTING']:
+        limiter.enabled = False
+
+
 def init_notifications(app):
     apns.init_app(app, db)
 
@@ -176,6 +271,12 @@ def init_logging(app):
     root_logger.setLevel(app.config['LOG_LEVEL'])
 
 
+def init_templates(app):
+    """Compile the view templates so that the first requests do not."""
+    for template_name in PRECOMPILED_TEMPLATES:
+        app.jinja_env.get_template(template_name)
+
+
 def create_app():
     """Create and configure an instance of the Flask application."""
     app = Flask(__name__, instance_relative_config=True)
@@ -186,8 +287,11 @@ def create_app():
     init_migrate(app)
     init_jwt(app)
     init_login(app)
+    init_limiter(app)
     init_api(app)
-    init_admin(app)
+    if app.config['ENABLE_ADMIN'] and not app.config['TESTING']:
+        init_admin(app)
     init_notifications(app)
+    init_templates(app)
 
     return app
@@ -63,6 +63,14 @@ SPACES_TILES_RATIO_MIN = 2
 UDID_MAX_LENGTH = 64
 
 DISPLAY_NAME_LENGTH_MAX = 15
+USERNAME_LENGTH_MAX = 255
+# The maximum number of bytes in a UTF-8 encoded password. bcrypt ignores
+# everything past the first 72 bytes, so longer passwords would be cut short
+# without their users knowing.
+PASSWORD_LENGTH_MAX = 72
+
+LOGIN_RATE_LIMIT = '10/minute'
+REGISTER_RATE_LIMIT = '5/minute'
 FRIEND_KEY_CHARACTERS = 'ABCDEFGHJKMNPQRSTUVWXYZ23456789'
 FRIEND_KEY_LENGTH = 7
 
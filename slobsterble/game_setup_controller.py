@@ -5,7 +5,7 @@ import datetime
 import random
 
 from jsonschema import validate as schema_validate, ValidationError
-from sqlalchemy.orm import subqueryload
+from sqlalchemy.orm import selectinload
 
 import slobsterble.api_exceptions
 from slobsterble.app import db
@@ -182,7 +182,7 @@ def fetch_distribution_tile_counts(distribution_id):
     """Get the tile count objects for the tile distribution."""
     distribution = db.session.query(Distribution).filter_by(
         id=distribution_id).options(
-        subqueryload(Distribution.tile_distribution).joinedload(
+        selectinload(Distribution.tile_distribution).joinedload(
             TileCount.tile)).one()
     tile_counts = [tile_count for tile_count in distribution.tile_distribution]
     return tile_counts
@@ -5,7 +5,6 @@ import random
 from flask_login import UserMixin
 from sqlalchemy import func, PrimaryKeyConstraint, UniqueConstraint
 from sqlalchemy.orm import backref, relation, relationship
-from werkzeug.security import check_password_hash, generate_password_hash
 
 from slobsterble.app import db
 from slobsterble.constants import (
@@ -19,6 +18,10 @@ from slobsterble.models.mixins import (
     ModelMixin,
     ModelSerializer,
 )
+from slobsterble.utilities.password_utilities import (
+    check_password,
+    hash_password,
+)
 
 
 friends = db.Table(
@@ -52,10 +55,10 @@ class User(db.Model, UserMixin, ModelMixin, ModelSerializer):
     password_hash = db.Column(db.String(255), nullable=False)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return check_password(self.password_hash, password)
 
     def __repr__(self):
         return self.username
@@ -83,7 +86,8 @@ class Player(db.Model, MetadataMixin, ModelSerializer):
     wins = db.Column(db.Integer, nullable=False, default=0)
     ties = db.Column(db.Integer, nullable=False, default=0)
     losses = db.Column(db.Integer, nullable=False, default=0)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True,
+                        nullable=False)
     user = relationship('User', backref=db.backref('player', uselist=False))
     highest_individual_score = db.Column(db.Integer, nullable=False, default=0)
     highest_combined_score = db.Column(db.Integer, nullable=False, default=0)
@@ -47,6 +47,7 @@ class APNSManager:
         app.config.setdefault('APNS_HEARTBEAT_SECONDS', None)
         app.config.setdefault('APNS_USE_SANDBOX', False)
         app.config.setdefault('APNS_NOTIFICATION_RETRIES_MAX', 3)
+        app.config.setdefault('APNS_NOTIFY_IN_BACKGROUND', True)
 
     def refresh_client(self):
         """Reset the client."""
@@ -1,9 +1,51 @@
 """Module for processing notifications."""
 
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy.orm import joinedload
+
 from slobsterble.app import apns, db
 from slobsterble.models import Device, Game, GamePlayer
 from slobsterble.notifications.notification_factory import NotificationFactory
 
+# A single thread sends the notifications, in the order they are submitted.
+# Every notification is sent through submit_notification, so outside of tests
+# the APNs connection is only ever used from this thread.
+_notification_pool = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix='notification')
+
+
+def _notify(app, notify_function, args):
+    """Call the notify function, logging rather than raising failures."""
+    try:
+        notify_function(*args)
+    except Exception:
+        app.logger.exception('Failed to send notifications.')
+
+
+def _notify_in_app_context(app, notify_function, args):
+    """Call the notify function with an app context of its own."""
+    with app.app_context():
+        _notify(app, notify_function, args)
+
+
+def submit_notification(notify_function, *args):
+    """
+    Call the notify function with the arguments in the background.
+
+    The arguments must not be bound to the request's database session,
+    since the notification thread queries through a session of its own.
+    If APNS_NOTIFY_IN_BACKGROUND is off, as it is under test, the function
+    is called before returning instead.
+    """
+    app = current_app._get_current_object()
+    if not app.config['APNS_NOTIFY_IN_BACKGROUND']:
+        _notify(app, notify_function, args)
+        return
+    _notification_pool.submit(
+        _notify_in_app_context, app, notify_function, args)
+
 
 def notify_next_player(game_id):
     """Notify the next player in the game that it is their turn."""
@@ -24,10 +66,17 @@ def notify_next_player(game_id):
     apns.notify(notification_requests)
 
 
-def notify_new_game(game_id, game_players, creator_player):
+def notify_new_game(game_id, creator_player_id):
+    """Notify the players in a new game, except its creator."""
+    game_players = db.session.query(GamePlayer).filter(
+        GamePlayer.game_id == game_id).options(
+        joinedload(GamePlayer.player)).all()
+    creator_name = next(
+        game_player.player.display_name for game_player in game_players
+        if game_player.player_id == creator_player_id)
     notification_requests = []
     for game_player in game_players:
-        if game_player.player_id == creator_player.id:
+        if game_player.player_id == creator_player_id:
             # Do not notify the player that created the game.
             continue
         player_devices = db.session.query(Device).filter(
@@ -37,8 +86,8 @@ def notify_new_game(game_id, game_players, creator_player):
                 NotificationFactory.make_new_game_notification(
                     device_token=player_device.device_token,
                     game_id=game_id,
-                    creator_name=creator_player.display_name,
+                    creator_name=creator_name,
                     your_turn=game_player.turn_order == 0
                 )
             )
-        apns.notify(notification_requests)
+    apns.notify(notification_requests)
@@ -18,12 +18,17 @@ elif 'TESTING' in os.environ:
 
 ADMIN_USERNAME = None
 ADMIN_PASSWORD = None
+ADMIN_PASSWORD_HASH = None
 
 SECRET_KEY = None
 
+# Clients do not depend on the key order of JSON responses, so skip sorting.
+JSON_SORT_KEYS = False
+
 SQL_DIALECT = None
 DATABASE_PATH = None
 SQLALCHEMY_TRACK_MODIFICATIONS = None
 SQLALCHEMY_ECHO = None
+SQLALCHEMY_ENGINE_OPTIONS = None
 
 load_config(sys.modules[__name__], testing=TESTING)
@@ -32,10 +32,28 @@ def load_config(settings, testing=False):
     settings.SQLALCHEMY_TRACK_MODIFICATIONS = config.get(
         'db', 'SQLALCHEMY_TRACK_MODIFICATIONS')
     settings.SQLALCHEMY_ECHO = config.getboolean('db', 'SQLALCHEMY_ECHO')
+    settings.SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_pre_ping': config.getboolean(
+            'db', 'POOL_PRE_PING', fallback=True),
+        'pool_recycle': config.getint(
+            'db', 'POOL_RECYCLE_SECONDS', fallback=1800),
+    }
     settings.ADMIN_USERNAME = config.get('db', 'ADMIN_USERNAME')
-    settings.ADMIN_PASSWORD = config.get('db', 'ADMIN_PASSWORD')
+    settings.ADMIN_PASSWORD = config.get('db', 'ADMIN_PASSWORD', fallback=None)
+    settings.ADMIN_PASSWORD_HASH = config.get(
+        'db', 'ADMIN_PASSWORD_HASH', fallback=None)
     settings.SECRET_KEY = config.get('flask', 'SECRET_KEY')
     settings.LOG_LEVEL = config.get('flask', 'LOG_LEVEL')
+    settings.ENABLE_ADMIN = config.getboolean(
+        'flask', 'ENABLE_ADMIN', fallback=True)
+    settings.PASSWORD_HASH_METHOD = config.get(
+        'flask', 'PASSWORD_HASH_METHOD', fallback='bcrypt:12')
+    settings.PASSWORD_HASH_SALT_LENGTH = config.getint(
+        'flask', 'PASSWORD_HASH_SALT_LENGTH', fallback=8)
+    settings.RATELIMIT_STORAGE_URL = config.get(
+        'flask', 'RATELIMIT_STORAGE_URL', fallback='memory://')
+    settings.RATELIMIT_ENABLED = config.getboolean(
+        'flask', 'RATELIMIT_ENABLED', fallback=True)
 
     settings.JWT_SECRET_KEY = config.get('jwt', 'JWT_SECRET_KEY')
     settings.JWT_ACCESS_TOKEN_EXPIRES = datetime.timedelta(
@@ -52,3 +70,6 @@ def load_config(settings, testing=False):
     settings.APNS_HEARTBEAT_SECONDS = config.getint('apns', 'APNS_HEARTBEAT_SECONDS')
     settings.APNS_NOTIFICATION_RETRIES_MAX = config.getint('apns', 'APNS_NOTIFICATION_RETRIES_MAX')
     settings.APNS_USE_SANDBOX = config.getboolean('apns', 'APNS_USE_SANDBOX')
+    # Tests send notifications inline so that no thread outlives a request.
+    settings.APNS_NOTIFY_IN_BACKGROUND = config.getboolean(
+        'apns', 'APNS_NOTIFY_IN_BACKGROUND', fallback=not testing)
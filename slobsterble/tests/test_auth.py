@@ -0,0 +1,165 @@
+"""Test the authentication API."""
+
+from unittest.mock import patch
+
+import pytest
+from flask import g
+from flask_jwt_extended import create_refresh_token
+from limits import parse
+from sqlalchemy import delete, select
+from werkzeug.security import generate_password_hash
+
+from slobsterble.apis import auth
+from slobsterble.app import limiter
+from slobsterble.constants import LOGIN_RATE_LIMIT, PASSWORD_LENGTH_MAX
+from slobsterble.models import User
+from slobsterble.utilities.password_utilities import check_password
+
+REFRESH_TOKEN_IAT = 1600000000
+
+
+@pytest.fixture
+def enabled_limiter():
+    """Switch on the rate limits, which are off under test."""
+    limiter.enabled = True
+    yield limiter
+    limiter.enabled = False
+    limiter.reset()
+
+
+def _post_login(client, credentials):
+    """
+    Post the credentials to the login API.
+
+    The tests share one app context, and so one g, across requests.
+    Flask-Limiter marks g once it has checked a request's limits, so the
+    mark is cleared for each request as a new app context would.
+    """
+    g.pop('_rate_limiting_complete', None)
+    return client.post('/api/login', json=credentials)
+
+
+def test_login_rate_limit(client, enabled_limiter):
+    """Logins past the rate limit are rejected."""
+    credentials = {'username': 'Mallory', 'password': 'guess'}
+    for _ in range(parse(LOGIN_RATE_LIMIT).amount):
+        resp = _post_login(client, credentials)
+        assert resp.status_code == 401
+    resp = _post_login(client, credentials)
+    assert resp.status_code == 429
+
+
+@pytest.fixture
+def alice_refresh_headers(db, alice):
+    """Log Alice in with a refresh token and forget cached access tokens."""
+    alice_user, _ = alice
+    alice_user.refresh_token_iat = REFRESH_TOKEN_IAT
+    db.session.commit()
+    refresh_token = create_refresh_token(
+        alice_user, additional_claims={'iat': REFRESH_TOKEN_IAT})
+    auth._access_token_cache.clear()
+    yield {'Authorization': 'Bearer {}'.format(refresh_token)}
+    auth._access_token_cache.clear()
+    alice_user.refresh_token_iat = None
+    db.session.commit()
+
+
+def _refresh_access_token(client, headers, now_timestamp):
+    """Get the access token returned by a refresh at the given time."""
+    with patch('slobsterble.apis.auth.time') as mock_time:
+        mock_time.time.return_value = now_timestamp
+        resp = client.post('/api/refresh-access', headers=headers)
+    assert resp.status_code == 200
+    return resp.get_json()['token']
+
+
+def test_refresh_reuses_access_token(app_fixture, client,
+                                     alice_refresh_headers):
+    """A refresh early in an access token's life gets the same token."""
+    now_timestamp = REFRESH_TOKEN_IAT + 100
+    half_life = app_fixture.config[
+        'JWT_ACCESS_TOKEN_EXPIRES'].total_seconds() / 2
+    first_token = _refresh_access_token(
+        client, alice_refresh_headers, now_timestamp)
+    second_token = _refresh_access_token(
+        client, alice_refresh_headers, now_timestamp + half_life - 1)
+    assert second_token == first_token
+
+
+def test_refresh_after_half_life(app_fixture, client, alice_refresh_headers):
+    """A refresh past half of an access token's life gets a new token."""
+    now_timestamp = REFRESH_TOKEN_IAT + 100
+    half_life = app_fixture.config[
+        'JWT_ACCESS_TOKEN_EXPIRES'].total_seconds() / 2
+    first_token = _refresh_access_token(
+        client, alice_refresh_headers, now_timestamp)
+    second_token = _refresh_access_token(
+        client, alice_refresh_headers, now_timestamp + half_life + 1)
+    assert second_token != first_token
+
+
+def test_refresh_after_logout(client, alice_headers, alice_refresh_headers):
+    """A cached access token is not returned once the user logs out."""
+    _refresh_access_token(
+        client, alice_refresh_headers, REFRESH_TOKEN_IAT + 100)
+    resp = client.post('/api/logout', headers=alice_headers)
+    assert resp.status_code == 200
+    resp = client.post('/api/refresh-access', headers=alice_refresh_headers)
+    assert resp.status_code == 401
+
+
+@pytest.fixture
+def dave_legacy_hash(db):
+    """Create a User called Dave with a legacy werkzeug password hash."""
+    legacy_hash = generate_password_hash('Dave', method='pbkdf2:sha256')
+    db.session.add(User(username='Dave', password_hash=legacy_hash))
+    db.session.commit()
+    yield legacy_hash
+    db.session.execute(delete(User).where(User.username == 'Dave'))
+    db.session.commit()
+
+
+def test_login_upgrades_legacy_hash(db, client, dave_legacy_hash):
+    """A legacy werkzeug hash still verifies and is replaced by bcrypt."""
+    resp = client.post(
+        '/api/login', json={'username': 'Dave', 'password': 'Dave'})
+    assert resp.status_code == 200
+    password_hash = db.session.execute(select(User.password_hash).where(
+        User.username == 'Dave')).scalar()
+    assert password_hash != dave_legacy_hash
+    assert password_hash.startswith('$2')
+    assert check_password(password_hash, 'Dave')
+
+
+def test_password_length_in_bytes():
+    """Passwords are limited to the bytes that bcrypt reads."""
+    password = 'a' * PASSWORD_LENGTH_MAX
+    assert auth._registration_error(
+        'Erin', password, password, 'Erin') is None
+    # The last character takes two bytes in UTF-8.
+    password = 'a' * (PASSWORD_LENGTH_MAX - 1) + '\u00e9'
+    assert auth._registration_error(
+        'Erin', password, password, 'Erin') is not None
+
+
+def test_login_rate_limit_by_address(client, enabled_limiter):
+    """A client trying a new username each time is still rate limited."""
+    for attempt in range(parse(LOGIN_RATE_LIMIT).amount):
+        resp = _post_login(
+            client, {'username': 'Mallory%d' % attempt, 'password': 'guess'})
+        assert resp.status_code == 401
+    resp = _post_login(client, {'username': 'Trudy', 'password': 'guess'})
+    assert resp.status_code == 429
+
+
+def test_null_character_password(client):
+    """Passwords with null characters are refused rather than erroring."""
+    password = 'pass\0word'
+    resp = client.post('/api/register', json={
+        'username': 'Erin', 'password': password,
+        'confirmed_password': password, 'display_name': 'Erin'})
+    assert resp.status_code == 400
+    for username in ('Alice', 'Mallory'):
+        resp = client.post(
+            '/api/login', json={'username': username, 'password': password})
+        assert resp.status_code == 401
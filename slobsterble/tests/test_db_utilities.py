@@ -0,0 +1,87 @@
+"""Test the database utility functions."""
+
+import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from slobsterble.models import Device, Modifier
+from slobsterble.models.user import friends
+from slobsterble.utilities.db_utilities import (
+    fetch_or_create_many,
+    insert_rows_or_ignore,
+    upsert,
+)
+
+
+@pytest.fixture
+def rolled_back_session(db):
+    """Roll back the changes that a test makes to the database session."""
+    yield db.session
+    db.session.rollback()
+
+
+def test_insert_rows_or_ignore(rolled_back_session, alice, bob, carol):
+    """Rows that conflict with existing rows are skipped."""
+    _, alice_player = alice
+    _, bob_player = bob
+    _, carol_player = carol
+    alice_id, bob_id, carol_id = \
+        alice_player.id, bob_player.id, carol_player.id
+    rolled_back_session.execute(friends.insert().values(
+        my_player_id=alice_id, friend_player_id=bob_id))
+    inserted_count = insert_rows_or_ignore(
+        rolled_back_session, friends, ['my_player_id', 'friend_player_id'],
+        [{'my_player_id': alice_id, 'friend_player_id': bob_id},
+         {'my_player_id': alice_id, 'friend_player_id': carol_id}])
+    assert inserted_count == 1
+    friend_ids = rolled_back_session.execute(
+        select(friends.c.friend_player_id).where(
+            friends.c.my_player_id == alice_id)).scalars().all()
+    assert sorted(friend_ids) == sorted([bob_id, carol_id])
+
+
+def test_upsert(rolled_back_session, alice):
+    """A conflicting row is updated rather than duplicated."""
+    alice_user, _ = alice
+    alice_id = alice_user.id
+    first_refreshed = datetime.datetime(2021, 1, 1)
+    second_refreshed = datetime.datetime(2021, 2, 1)
+    for refreshed in (first_refreshed, second_refreshed):
+        upsert(rolled_back_session, Device, ['user_id', 'device_token'],
+               user_id=alice_id, device_token='test-device',
+               refreshed=refreshed)
+    devices = rolled_back_session.execute(
+        select(Device.refreshed).where(
+            Device.user_id == alice_id,
+            Device.device_token == 'test-device')).all()
+    assert len(devices) == 1
+    assert devices[0].refreshed.replace(tzinfo=None) == second_refreshed
+
+
+def test_fetch_or_create_many(rolled_back_session):
+    """Both existing and created instances are returned with their ids."""
+    columns = ['letter_multiplier', 'word_multiplier']
+    existing_key = (4, 3)
+    new_key = (3, 4)
+    rolled_back_session.query(Modifier).filter(
+        Modifier.letter_multiplier == new_key[0],
+        Modifier.word_multiplier == new_key[1]).delete()
+    existing = rolled_back_session.query(Modifier).filter_by(
+        letter_multiplier=existing_key[0],
+        word_multiplier=existing_key[1]).one_or_none()
+    if existing is None:
+        existing = Modifier(letter_multiplier=existing_key[0],
+                            word_multiplier=existing_key[1])
+        rolled_back_session.add(existing)
+        rolled_back_session.flush()
+    modifier_count = rolled_back_session.execute(
+        select(func.count(Modifier.id))).scalar()
+    modifiers = fetch_or_create_many(
+        rolled_back_session, Modifier, columns, [existing_key, new_key])
+    assert modifiers.keys() == {existing_key, new_key}
+    assert modifiers[existing_key].id == existing.id
+    assert modifiers[new_key].id is not None
+    assert modifiers[new_key].id != existing.id
+    assert rolled_back_session.execute(
+        select(func.count(Modifier.id))).scalar() == modifier_count + 1
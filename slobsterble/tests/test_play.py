@@ -3,6 +3,7 @@
 from unittest.mock import patch
 
 import pytest
+from sqlalchemy import event, select
 
 from slobsterble.game_play_controller import (
     StatelessValidator,
@@ -13,7 +14,8 @@ from slobsterble.api_exceptions import (
     PlayCurrentTurnException,
     PlaySchemaException,
 )
-from slobsterble.models import Game, GamePlayer
+from slobsterble.models import Game, GamePlayer, TileCount
+from slobsterble.notifications.notify import notify_next_player
 
 
 def test_game_does_not_exist(client, alice_headers):
@@ -100,3 +102,87 @@ def test_pass(db, client, alice_headers, alice_bob_game):
     # Turn number increases.
     assert game.turn_number == 1
     assert alice_game_player.score == 0
+
+
+@pytest.fixture
+def alice_bob_game_in_progress(db, alice_bob_game):
+    """Give Alice a tile, so that her turn does not end the game."""
+    game, alice_game_player, bob_game_player = alice_bob_game
+    alice_game_player.rack = [db.session.query(TileCount).first()]
+    db.session.commit()
+    return game, alice_game_player, bob_game_player
+
+
+def test_notification_after_commit(db, client, alice_headers,
+                                   alice_bob_game_in_progress):
+    """The next player is notified only once the turn is committed."""
+    game, _, __ = alice_bob_game_in_progress
+    game_id = game.id
+    events = []
+    committed_turn_numbers = []
+
+    def record_commit(session):
+        events.append('commit')
+
+    def record_submit(notify_function, submitted_game_id):
+        events.append('submit')
+        # Read through a connection of its own to see only committed rows.
+        with db.engine.connect() as connection:
+            committed_turn_numbers.append(connection.execute(
+                select(Game.turn_number).where(
+                    Game.id == submitted_game_id)).scalar())
+
+    event.listen(db.session, 'after_commit', record_commit)
+    try:
+        with patch('slobsterble.apis.game.submit_notification',
+                   side_effect=record_submit) as submit:
+            resp = client.post(
+                f'/api/game/{game_id}', json=[], headers=alice_headers)
+    finally:
+        event.remove(db.session, 'after_commit', record_commit)
+    assert resp.status_code == 200
+    submit.assert_called_once_with(notify_next_player, game_id)
+    assert events[-2:] == ['commit', 'submit']
+    assert committed_turn_numbers == [1]
+
+
+def _pass_turn(client, game_id, headers):
+    """Pass the turn in the game without sending notifications."""
+    with patch('slobsterble.apis.game.submit_notification'):
+        resp = client.post(f'/api/game/{game_id}', json=[], headers=headers)
+    assert resp.status_code == 200
+
+
+def test_game_not_modified(client, alice_headers, alice_bob_game):
+    """A poll with the current ETag gets a 304 without a body."""
+    game, _, __ = alice_bob_game
+    resp = client.get(f'/api/game/{game.id}', headers=alice_headers)
+    assert resp.status_code == 200
+    etag = resp.headers['ETag']
+    resp = client.get(f'/api/game/{game.id}',
+                      headers={**alice_headers, 'If-None-Match': etag})
+    assert resp.status_code == 304
+    assert resp.get_data() == b''
+    assert resp.headers['ETag'] == etag
+
+
+def test_game_stale_etag(client, alice_headers, alice_bob_game):
+    """A poll with an ETag from before a move gets the new game state."""
+    game, _, __ = alice_bob_game
+    resp = client.get(f'/api/game/{game.id}', headers=alice_headers)
+    stale_etag = resp.headers['ETag']
+    _pass_turn(client, game.id, alice_headers)
+    resp = client.get(f'/api/game/{game.id}',
+                      headers={**alice_headers, 'If-None-Match': stale_etag})
+    assert resp.status_code == 200
+    assert resp.get_json()['turn_number'] == 1
+
+
+def test_game_etag_changes_with_turn(client, alice_headers, alice_bob_game):
+    """The ETag changes when the turn advances."""
+    game, _, __ = alice_bob_game
+    resp = client.get(f'/api/game/{game.id}', headers=alice_headers)
+    first_etag = resp.headers['ETag']
+    _pass_turn(client, game.id, alice_headers)
+    resp = client.get(f'/api/game/{game.id}', headers=alice_headers)
+    assert resp.headers['ETag'] != first_etag
@@ -1,5 +1,7 @@
 """Utility functions for working with the database generally."""
 
+from sqlalchemy import tuple_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import SQLAlchemyError
 
 
@@ -17,3 +19,130 @@ def fetch_or_create(session, model, **kwargs):
         instance = session.query(model).filter_by(**kwargs).one()
         return instance, False
     return instance, True
+
+
+def fetch_or_create_many(session, model, columns, keys):
+    """
+    Fetch the instances of the model with the given values, creating any
+    that are missing.
+
+    Each key is a tuple of values for the columns, which must be covered by
+    a unique constraint. Return a dict from each key to its instance.
+    """
+    keys = set(keys)
+
+    def fetch(fetch_keys):
+        if not fetch_keys:
+            return {}
+        key_columns = tuple_(*(getattr(model, column) for column in columns))
+        instances = session.query(model).filter(
+            key_columns.in_(list(fetch_keys))).all()
+        return {tuple(getattr(instance, column) for column in columns): instance
+                for instance in instances}
+
+    instances = fetch(keys)
+    missing_keys = keys - instances.keys()
+    if missing_keys:
+        rows = [dict(zip(columns, key)) for key in missing_keys]
+        statement = _conflict_insert(session, model)
+        if statement is None:
+            session.add_all(model(**row) for row in rows)
+            session.flush()
+        else:
+            session.execute(statement.values(rows).on_conflict_do_nothing(
+                index_elements=columns))
+        instances.update(fetch(missing_keys))
+    return instances
+
+
+def _conflict_insert(session, model):
+    """
+    Build an insert for the model or table that supports ON CONFLICT clauses.
+
+    Return None if the session's database does not support them.
+    """
+    table = getattr(model, '__table__', model)
+    dialect_name = session.bind.dialect.name
+    if dialect_name == 'postgresql':
+        return postgresql.insert(table)
+    if dialect_name == 'sqlite':
+        return sqlite.insert(table)
+    return None
+
+
+def insert_or_ignore(session, model, index_elements, **kwargs):
+    """
+    Insert an instance of the model unless it conflicts with an existing row.
+
+    The conflict is detected on the unique index_elements columns. Return
+    True iff a row was inserted.
+    """
+    statement = _conflict_insert(session, model)
+    if statement is None:
+        existing = session.query(model).filter_by(
+            **{column: kwargs[column] for column in index_elements}).first()
+        if existing is not None:
+            return False
+        session.add(model(**kwargs))
+        session.flush()
+        return True
+    statement = statement.values(**kwargs).on_conflict_do_nothing(
+        index_elements=index_elements)
+    return session.execute(statement).rowcount > 0
+
+
+def insert_rows_or_ignore(session, table, index_elements, rows):
+    """
+    Insert the rows into the table, skipping those that conflict.
+
+    The table is typically an association table without a model. Conflicts
+    are detected on the unique index_elements columns. Return the number of
+    rows inserted.
+    """
+    statement = _conflict_insert(session, table)
+    if statement is None:
+        key_columns = tuple_(*(table.c[column] for column in index_elements))
+        existing_keys = set(session.execute(
+            table.select().with_only_columns(
+                [table.c[column] for column in index_elements]).where(
+                key_columns.in_([tuple(row[column] for column in index_elements)
+                                 for row in rows]))).all())
+        rows = [row for row in rows
+                if tuple(row[column] for column in index_elements)
+                not in existing_keys]
+        if rows:
+            session.execute(table.insert(), rows)
+        return len(rows)
+    statement = statement.values(rows).on_conflict_do_nothing(
+        index_elements=index_elements)
+    return session.execute(statement).rowcount
+
+
+def upsert(session, model, index_elements, **kwargs):
+    """
+    Insert an instance of the model or update the row it conflicts with.
+
+    The conflict is detected on the unique index_elements columns. The
+    conflicting row is updated with the remaining kwargs and with any SQL
+    onupdate defaults of the model, such as the modified timestamp.
+    """
+    statement = _conflict_insert(session, model)
+    update_values = {column: value for column, value in kwargs.items()
+                     if column not in index_elements}
+    if statement is None:
+        instance = session.query(model).filter_by(
+            **{column: kwargs[column] for column in index_elements}).first()
+        if instance is None:
+            session.add(model(**kwargs))
+        else:
+            for column, value in update_values.items():
+                setattr(instance, column, value)
+        session.flush()
+        return
+    for column in model.__table__.columns:
+        if (column.onupdate is not None and column.onupdate.is_clause_element
+                and column.name not in update_values):
+            update_values[column.name] = column.onupdate.arg
+    statement = statement.values(**kwargs).on_conflict_do_update(
+        index_elements=index_elements, set_=update_values)
+    session.execute(statement)
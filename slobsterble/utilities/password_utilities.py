@@ -0,0 +1,93 @@
+"""Functions for hashing passwords with the configured method."""
+
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Hashing is CPU bound. The pool is per process and gunicorn runs one worker
+# process per CPU, so each process hashes one password at a time and its
+# request threads wait on the pool instead of oversubscribing the CPUs.
+HASH_THREADS_MAX = 1
+_hash_pool = ThreadPoolExecutor(
+    max_workers=HASH_THREADS_MAX, thread_name_prefix='password-hash')
+
+BCRYPT_METHOD = 'bcrypt'
+BCRYPT_ROUNDS_DEFAULT = 12
+BCRYPT_HASH_PREFIX = '$2'
+
+
+def _generate_hash(password, method, salt_length):
+    """
+    Hash the password with the method.
+
+    The method is either 'bcrypt', optionally followed by ':<rounds>', or
+    any method understood by werkzeug's generate_password_hash.
+    """
+    method_name, _, rounds = method.partition(':')
+    if method_name == BCRYPT_METHOD:
+        salt = bcrypt.gensalt(int(rounds or BCRYPT_ROUNDS_DEFAULT))
+        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('ascii')
+    return generate_password_hash(
+        password, method=method, salt_length=salt_length)
+
+
+def _check_hash(password_hash, password):
+    """Return True iff the password matches a bcrypt or werkzeug hash."""
+    if password_hash.startswith(BCRYPT_HASH_PREFIX):
+        if '\0' in password:
+            # bcrypt refuses null characters, so no bcrypt hash matches.
+            return False
+        return bcrypt.checkpw(
+            password.encode('utf-8'), password_hash.encode('ascii'))
+    return check_password_hash(password_hash, password)
+
+
+def hash_password(password):
+    """Hash the password with the configured method and salt length."""
+    return _hash_pool.submit(
+        _generate_hash, password,
+        current_app.config['PASSWORD_HASH_METHOD'],
+        current_app.config['PASSWORD_HASH_SALT_LENGTH']).result()
+
+
+def check_password(password_hash, password):
+    """Return True iff the password matches the hash."""
+    return _hash_pool.submit(_check_hash, password_hash, password).result()
+
+
+def password_needs_rehash(password_hash):
+    """
+    Return True iff the hash should be replaced by a bcrypt hash.
+
+    This is the case when bcrypt is the configured method and the hash is
+    not a bcrypt hash with the configured number of rounds.
+    """
+    method_name, _, rounds = \
+        current_app.config['PASSWORD_HASH_METHOD'].partition(':')
+    if method_name != BCRYPT_METHOD:
+        return False
+    if not password_hash.startswith(BCRYPT_HASH_PREFIX):
+        return True
+    # bcrypt hashes look like $2b$<rounds>$<salt and hash>.
+    return int(password_hash.split('$')[2]) != int(
+        rounds or BCRYPT_ROUNDS_DEFAULT)
+
+
+def dummy_password_hash():
+    """
+    Get a hash to check passwords against when the user does not exist.
+
+    The hash uses the configured method so that checking it costs the same
+    as checking a real user's password.
+    """
+    return _dummy_password_hash(
+        current_app.config['PASSWORD_HASH_METHOD'],
+        current_app.config['PASSWORD_HASH_SALT_LENGTH'])
+
+
+@functools.lru_cache(maxsize=None)
+def _dummy_password_hash(method, salt_length):
+    return _generate_hash('not a real password', method, salt_length)
@@ -0,0 +1,15 @@
+"""Functions for validating data against JSON schemas."""
+
+from jsonschema import validators
+
+
+def compile_schema(schema):
+    """
+    Check the schema and build a validator for it.
+
+    jsonschema.validate checks the schema and builds a validator on every
+    call, so views build their validators once with this instead.
+    """
+    validator_class = validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    return validator_class(schema)